@@ -5,10 +5,28 @@
 支持CSV、Excel、MySQL的读取和智能对比功能
 """
 
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
 import module.files
+import module.pipeline
+
+try:
+	import pyarrow as pa
+	import pyarrow.ipc
+except ImportError:  # 未安装 pyarrow 时并行合并的 forkserver/spawn 路径逐个分区序列化传送输入
+	pa = None
 
 
 # 以df1的A列为基准，将df2的A列与df1的A列进行匹配，如果匹配到，则将df2的B列、C列、D列的值赋值给df1的B列、C列、D列    
@@ -21,18 +39,20 @@ def merge_and_reorder(df1, df2, comparison_column, preserve_order_by=None, colum
 		- 'grouped': 分组排列（先df1的所有列，再df2的所有列）
 		- 'alphabetical': 按字母顺序排列
 	"""
-	# 为每个DataFrame添加原始行索引列以保持行顺序
-	df1_with_index = df1.copy()
-	df2_with_index = df2.copy()
-	
-	# 添加原始行索引列
-	df1_with_index['_original_row_index_1'] = range(len(df1_with_index))
-	df2_with_index['_original_row_index_2'] = range(len(df2_with_index))
-	
-	# 保留原始列集合用于后续列名构建
-	df1_cols = list(df1.columns)
-	df2_cols = list(df2.columns)
+	df1_with_index, df2_with_index = _with_row_index(df1, df2)
+	merged_df = _merge_rows(df1_with_index, df2_with_index, comparison_column, preserve_order_by)
+	return _finalize_merged(merged_df, list(df1.columns), list(df2.columns), comparison_column,
+		preserve_order_by, column_sort_strategy)
+
+
+def _with_row_index(df1, df2):
+	"""为每个DataFrame添加原始行索引列以保持行顺序（与原表共享列数据，不复制）"""
+	return (df1.assign(_original_row_index_1=np.arange(len(df1))),
+		df2.assign(_original_row_index_2=np.arange(len(df2))))
+
 
+def _merge_rows(df1_with_index, df2_with_index, comparison_column, preserve_order_by):
+	"""按比较列合并两侧的行（尚未排序）"""
 	# 根据是否需要保留某一侧的顺序选择合并方式
 	if preserve_order_by == 'df2':
 		# 以 df2 的顺序为主，用 left merge 保留 df2 顺序；设置后缀使得原 df1 列标记为 _1
@@ -42,9 +62,20 @@ def merge_and_reorder(df1, df2, comparison_column, preserve_order_by=None, colum
 	else:
 		# 默认行为：outer 合并（原始实现）
 		merged_df = pd.merge(df1_with_index, df2_with_index, on=comparison_column, how='outer', suffixes=('', '_2'))
+	return merged_df
 
+
+def _finalize_merged(merged_df, df1_cols, df2_cols, comparison_column, preserve_order_by, column_sort_strategy,
+		presorted=False):
+	"""对合并结果排序、整理索引列并按策略重排列，返回 (结果, 成对列名)
+	参数:
+	  df1_cols, df2_cols: 原始列集合，用于后续列名构建
+	  presorted: 行已按 preserve_order_by 排好序时跳过排序
+	"""
 	# 根据preserve_order_by参数决定排序方式
-	if preserve_order_by == 'df2':
+	if presorted:
+		pass
+	elif preserve_order_by == 'df2':
 		# 按df2的原始行索引排序，df1的索引作为次要排序条件
 		merged_df = merged_df.sort_values(['_original_row_index_2', '_original_row_index_1']).reset_index(drop=True)
 	elif preserve_order_by == 'df1':
@@ -139,56 +170,730 @@ def merge_and_reorder(df1, df2, comparison_column, preserve_order_by=None, colum
 	final_columns = valid_columns
 	
 	# 按新顺序重新排列
-	# 统一生成用于高亮的成对列名（自动匹配同名列）
+	column_pairs = _column_pairs(common_columns, preserve_order_by, merged_df.columns)
+	
+	return merged_df[final_columns], column_pairs
+
+
+def _column_pairs(common_columns, preserve_order_by, merged_columns):
+	"""统一生成用于高亮的成对列名（自动匹配同名列）"""
 	column_pairs = []
 	suffix_other = '_1' if preserve_order_by == 'df2' else '_2'
 	for base_col in common_columns:
 		left_name = f"{base_col}" if suffix_other == '_2' else f"{base_col}{suffix_other}"
 		right_name = f"{base_col}{suffix_other}" if suffix_other == '_2' else f"{base_col}"
 		# 确保这两列存在于结果中
-		if left_name in merged_df.columns and right_name in merged_df.columns:
+		if left_name in merged_columns and right_name in merged_columns:
 			column_pairs.append((left_name, right_name))
-	
-	return merged_df[final_columns], column_pairs
+	return column_pairs
+
+
+# 默认比较规则：可通过 column_rules 按列覆盖，键 '*' 表示对所有列生效
+DEFAULT_COMPARE_RULE = {
+	'atol': 0.0,            # 数值绝对容差
+	'rtol': 0.0,            # 数值相对容差（如 1e-9 可吸收浮点舍入误差，需按列开启）
+	'numeric': True,        # 至少一侧是数值时按数值比较（1 与 1.0、1 与 '1' 视为相同），整数精确比较
+	'numeric_text': False,  # 两侧都是文本时也按数值解析（'007' 与 '7' 视为相同），需按列开启
+	'strip': True,          # 字符串比较前去除首尾空白
+	'ignore_case': False,   # 字符串比较忽略大小写
+	'parse_dates': False,   # 按日期解析后比较（不同格式的相同日期视为相同）
+	'empty_as_null': True,  # 空字符串视为空值（NaN 与 '' 视为相同）
+	'ignore': False,        # 忽略该列，不参与比较
+}
+
+
+def _resolve_rule(column_rules, base_col):
+	"""合并默认规则、通配规则与列规则"""
+	rule = dict(DEFAULT_COMPARE_RULE)
+	if column_rules:
+		rule.update(column_rules.get('*', {}))
+		rule.update(column_rules.get(base_col, {}))
+	return rule
+
+
+def _pair_base_name(col1, col2):
+	"""由成对列名还原原始列名（(col, col_2) 或 (col_1, col)）"""
+	return col1 if col2 == f"{col1}_2" else col2
+
+
+def _column_values(series):
+	"""取出列的 NumPy 数组，非数值列统一转为 object 数组"""
+	if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+		return series.to_numpy()
+	return series.to_numpy(dtype=object)
+
+
+def _null_mask(series, rule):
+	"""空值掩码，按规则把空白字符串也视为空值"""
+	mask = series.isna().to_numpy(dtype=bool, copy=True)
+	if rule['empty_as_null'] and (series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+		try:
+			text = series.str.strip() if rule['strip'] else series
+			mask |= text.eq('').fillna(False).to_numpy(dtype=bool)
+		except AttributeError:
+			# object 列中不含任何字符串
+			pass
+	return mask
+
+
+# 整数形式的文本，如 '7'、'-12'、'110101199003071234'
+_INTEGER_TEXT = re.compile(r'\s*[+-]?\d+\s*')
+
 
+def _is_number(value):
+	"""单元格是否为数值（布尔值除外）"""
+	return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
 
-def highlight_differences(output_path, column_pairs):
-	"""在 Excel 中高亮显示不同的值"""
+
+def _numeric_cells(series):
+	"""数值单元格掩码：数值列全部为 True，object 列按单元格判断，文本列全部为 False"""
+	dtype = series.dtype
+	if pd.api.types.is_bool_dtype(dtype):
+		return np.zeros(len(series), dtype=bool)
+	if pd.api.types.is_numeric_dtype(dtype):
+		return np.ones(len(series), dtype=bool)
+	if dtype == object:
+		return series.map(_is_number).to_numpy(dtype=bool)
+	return np.zeros(len(series), dtype=bool)
+
+
+def _plain_numeric(series):
+	"""是否为 NumPy 数值列（不含布尔列和可空扩展类型）"""
+	dtype = series.dtype
+	return (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+		and not pd.api.types.is_extension_array_dtype(dtype))
+
+
+def _integer_values(series):
+	"""把整数值精确转为 Python int（不经过 float64），返回 (值数组, 是否为整数的掩码)
+	整数单元格、整数值的浮点数和整数形式的文本都视为整数
+	"""
+	dtype = series.dtype
+	result = np.full(len(series), None, dtype=object)
+	if _plain_numeric(series) and dtype.kind in 'iu':
+		return series.to_numpy().astype(object), np.ones(len(series), dtype=bool)
+	if _plain_numeric(series):
+		values = series.to_numpy(dtype=float)
+		with np.errstate(invalid='ignore'):
+			mask = np.isfinite(values) & (values == np.trunc(values))
+		result[mask] = [int(value) for value in values[mask]]
+		return result, mask
+	if dtype != object and pd.api.types.is_string_dtype(dtype):
+		mask = series.str.fullmatch(_INTEGER_TEXT.pattern).fillna(False).to_numpy(dtype=bool)
+		result[mask] = [int(value) for value in series.to_numpy(dtype=object)[mask]]
+		return result, mask
+
+	values = series.to_numpy(dtype=object)
+	mask = np.zeros(len(values), dtype=bool)
+	for i, value in enumerate(values):
+		if isinstance(value, (bool, np.bool_)):
+			continue
+		if isinstance(value, (int, np.integer)):
+			result[i] = int(value)
+		elif isinstance(value, (float, np.floating)) and np.isfinite(value) and float(value).is_integer():
+			result[i] = int(value)
+		elif isinstance(value, str) and _INTEGER_TEXT.fullmatch(value):
+			result[i] = int(value)
+		else:
+			continue
+		mask[i] = True
+	return result, mask
+
+
+def _exact_equal(series1, series2):
+	"""数组级精确相等；整数与浮点数混合比较时，超出 2**53 的值改用 Python 数值精确比较"""
+	if series1.dtype == series2.dtype and series1.dtype != object:
+		# 同类型列直接用列式比较（数值列走 NumPy，字符串列走 Arrow）
+		return series1.eq(series2).fillna(False).to_numpy(dtype=bool)
+	values1 = _column_values(series1)
+	values2 = _column_values(series2)
+	same = np.asarray(values1 == values2, dtype=bool)
+	if values1.dtype.kind in 'iu' or values2.dtype.kind in 'iu':
+		if values1.dtype != object and values2.dtype != object and np.result_type(values1, values2).kind == 'f':
+			# int64 与 uint64、整数与浮点数会先转为 float64 比较，大整数可能被误判为相同
+			with np.errstate(invalid='ignore'):
+				large = same & ((np.abs(values1.astype(float)) >= 2 ** 53) | (np.abs(values2.astype(float)) >= 2 ** 53))
+			rows = np.flatnonzero(large)
+			same[rows] = [a == b for a, b in zip(values1[rows].astype(object), values2[rows].astype(object))]
+	return same
+
+
+def _as_float(series):
+	"""尽量把列解析为浮点数组，无法解析的位置为 NaN"""
+	if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_datetime64_any_dtype(series.dtype):
+		return np.full(len(series), np.nan)
 	try:
-		# 打开 Excel 文件
-		workbook = load_workbook(output_path)
-		sheet = workbook.active
+		return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+	except (TypeError, ValueError):
+		return np.full(len(series), np.nan)
 
-		# 设置高亮样式（黄色填充）
-		fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
 
-		# 优化：预先构建列名到列索引的映射
-		header_row = sheet[1]
-		col_mapping = {}
-		for cell in header_row:
-			if cell.value:
-				col_mapping[cell.value] = cell.col_idx
+def _may_hold_dates(series):
+	"""列是否可能含日期：日期列或文本列；数值列和布尔列不参与日期解析"""
+	dtype = series.dtype
+	return (pd.api.types.is_datetime64_any_dtype(dtype) or dtype == object
+		or pd.api.types.is_string_dtype(dtype))
 
-		# 优化：只处理有效的列对（自动匹配同名列形成的对）
-		valid_column_pairs = []
-		for col1, col2 in column_pairs:
-			if col1 in col_mapping and col2 in col_mapping:
-				valid_column_pairs.append((col_mapping[col1], col_mapping[col2]))
 
-		# 批量处理高亮
-		max_row = sheet.max_row
-		highlighted_cells = 0
-		
-		for col1_index, col2_index in valid_column_pairs:
-			for row in range(2, max_row + 1):  # 跳过标题行
-				value1 = sheet.cell(row=row, column=col1_index).value
-				value2 = sheet.cell(row=row, column=col2_index).value
+def _as_datetime(series):
+	"""把日期列或文本列解析为 datetime64 数组，无法解析的位置（包括数值单元格）为 NaT"""
+	if series.dtype == object:
+		# object 列中的数值单元格不按纪元时间戳解析
+		series = series.where(series.map(lambda value: not isinstance(value, (int, float, np.number))))
+	return pd.to_datetime(series, errors='coerce', format='mixed').to_numpy(dtype='datetime64[ns]')
+
+
+def _as_text(series, rule):
+	"""按规则规范化为字符串数组"""
+	text = series.astype(str)
+	if rule['strip']:
+		text = text.str.strip()
+	if rule['ignore_case']:
+		text = text.str.casefold()
+	return text.to_numpy(dtype=object)
+
+
+def _column_difference(series1, series2, rule):
+	"""按规则逐列计算差异掩码（True 表示不同）
+
+	先用数组级的精确相等筛掉绝大多数相同单元格，
+	只对剩余行做空值、日期、数值容差和字符串规范化等较慢的判断。
+	"""
+	n = len(series1)
+	diff = np.zeros(n, dtype=bool)
+	if rule['ignore'] or n == 0:
+		return diff
+
+	try:
+		same = _exact_equal(series1, series2)
+		if same.shape != (n,):
+			same = np.zeros(n, dtype=bool)
+	except (TypeError, ValueError):
+		same = np.zeros(n, dtype=bool)
+
+	pending = np.flatnonzero(~same)
+	if len(pending) == 0:
+		return diff
+	sub1 = series1.iloc[pending].reset_index(drop=True)
+	sub2 = series2.iloc[pending].reset_index(drop=True)
+
+	# 空值：两侧均为空视为相同，仅一侧为空视为不同
+	null1 = _null_mask(sub1, rule)
+	null2 = _null_mask(sub2, rule)
+	sub_diff = null1 != null2
+	remaining = ~(null1 | null2)
+
+	# 数值：至少一侧是数值单元格（或按列开启 numeric_text）且两侧均可解析为数值时按数值比较；
+	# 两侧都是整数时用 Python int 精确比较，不经过 float64
+	if rule['numeric'] and remaining.any():
+		candidates = remaining.copy()
+		if not rule['numeric_text']:
+			candidates &= _numeric_cells(sub1) | _numeric_cells(sub2)
+		tolerance = rule['atol'] > 0 or rule['rtol'] > 0
+		if not tolerance and _plain_numeric(sub1) and _plain_numeric(sub2):
+			# 两侧都是数值列且不设容差：精确比较已判定这些行不同
+			sub_diff[candidates] = True
+			remaining &= ~candidates
+			candidates[:] = False
+		if candidates.any():
+			rows = np.flatnonzero(candidates)
+			ints1, is_int1 = _integer_values(sub1.iloc[rows])
+			ints2, is_int2 = _integer_values(sub2.iloc[rows])
+			both = is_int1 & is_int2
+			a = ints1[both]
+			b = ints2[both]
+			different = np.asarray(a != b, dtype=bool)
+			if tolerance and len(a):
+				different &= ~np.asarray(np.abs(a - b) <= rule['atol'] + rule['rtol'] * np.abs(b), dtype=bool)
+			exact = rows[both]
+			sub_diff[exact] = different
+			candidates[exact] = False
+			remaining[exact] = False
+
+			numbers1 = _as_float(sub1)
+			numbers2 = _as_float(sub2)
+			numeric = candidates & ~np.isnan(numbers1) & ~np.isnan(numbers2)
+			if numeric.any():
+				a = numbers1[numeric]
+				b = numbers2[numeric]
+				with np.errstate(invalid='ignore', over='ignore'):
+					sub_diff[numeric] = (a != b) & ~(np.abs(a - b) <= rule['atol'] + rule['rtol'] * np.abs(b))
+				remaining &= ~numeric
+
+	# 日期：数值比较之后进行，且只解析日期列和文本列（数值列会被当作纪元时间戳而丢失小数）
+	if rule['parse_dates'] and remaining.any() and _may_hold_dates(sub1) and _may_hold_dates(sub2):
+		dates1 = _as_datetime(sub1)
+		dates2 = _as_datetime(sub2)
+		dated = remaining & ~np.isnat(dates1) & ~np.isnat(dates2)
+		sub_diff[dated] = dates1[dated] != dates2[dated]
+		remaining &= ~dated
+
+	# 其余按规范化后的字符串比较
+	if remaining.any():
+		rows = np.flatnonzero(remaining)
+		text1 = _as_text(sub1.iloc[rows], rule)
+		text2 = _as_text(sub2.iloc[rows], rule)
+		sub_diff[rows] = text1 != text2
+
+	diff[pending] = sub_diff
+	return diff
+
+
+def compute_difference_masks(merged_df, column_pairs, column_rules=None):
+	"""按列计算成对列的差异掩码
+	参数:
+	  merged_df: merge_and_reorder 返回的合并结果
+	  column_pairs: merge_and_reorder 返回的成对列名
+	  column_rules: {列名: 规则字典}，规则键见 DEFAULT_COMPARE_RULE；'*' 对所有列生效
+	返回:
+	  {(列1, 列2): 布尔数组}，数组下标与 merged_df 的行位置一致
+	"""
+	diff_masks = {}
+	for col1, col2 in column_pairs:
+		rule = _resolve_rule(column_rules, _pair_base_name(col1, col2))
+		diff_masks[(col1, col2)] = _column_difference(merged_df[col1], merged_df[col2], rule)
+	return diff_masks
+
+
+def summarize_differences(diff_masks):
+	"""统计每对列的差异行数"""
+	return {pair: int(np.count_nonzero(mask)) for pair, mask in diff_masks.items()}
+
+
+# 并行合并时各任务的输入，按任务标识保存：fork 出的工作进程直接继承；
+# forkserver/spawn 工作进程由 _load_partition_state 内存映射主进程写出的 Arrow 文件
+_PARTITION_STATE = {}
+_PARTITION_TOKENS = itertools.count()
+
+
+def _parallel_context():
+	"""选择工作进程的启动方式
+	只有调用方是单线程时才 fork：多线程进程（GUI 的对比线程、HTTP 服务的请求线程等）中 fork 出的子进程
+	会继承其他线程持有的锁，可能死锁；此时改用 forkserver（可用时）或 spawn
+	"""
+	methods = multiprocessing.get_all_start_methods()
+	if 'fork' in methods and threading.active_count() == 1:
+		return multiprocessing.get_context('fork')
+	if 'forkserver' not in methods:
+		return multiprocessing.get_context('spawn')
+	context = multiprocessing.get_context('forkserver')
+	# fork 服务进程预先导入本模块（及 pandas），工作进程从它 fork 出来后不必再逐个导入
+	context.set_forkserver_preload(list(dict.fromkeys(['__main__', __name__])))
+	return context
+
+
+def _write_shared_frames(frames):
+	"""把各侧的比较列和公共列分别写成 Arrow IPC 文件（不压缩），供工作进程内存映射，返回文件路径列表
+	未安装 pyarrow 或存在 Arrow 无法表示的列（混合类型 object 列等）时返回 None
+	"""
+	if pa is None:
+		return None
+	paths = []
+	try:
+		for frame in frames:
+			positional = frame.copy(deep=False)
+			positional.columns = [f"_{position}" for position in range(frame.shape[1])]
+			table = pa.Table.from_pandas(positional, preserve_index=False)
+			fd, path = tempfile.mkstemp(suffix='.arrow')
+			os.close(fd)
+			paths.append(path)
+			with pa.OSFile(path, 'wb') as sink:
+				with pa.ipc.new_file(sink, table.schema) as writer:
+					writer.write_table(table)
+	except (pa.ArrowException, OverflowError):
+		_remove_files(paths)
+		return None
+	return paths
+
+
+def _remove_files(paths):
+	for path in paths:
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+
+def _load_partition_state(token, state):
+	"""forkserver/spawn 工作进程的初始化函数：内存映射两侧的 Arrow 文件，按分区取行时才转换为 DataFrame"""
+	state = dict(state)
+	state['tables'] = [pa.ipc.open_file(pa.memory_map(path, 'r')).read_all() for path in state['paths']]
+	_PARTITION_STATE[token] = state
+
+
+def _partition_frame(state, side, rows, key_only=False):
+	"""取出一侧（0 为 df1，1 为 df2）在给定行位置上的比较列和公共列；key_only 时只取比较列"""
+	if 'tables' not in state:
+		frame = state['frames'][side]
+		return (frame.iloc[:, :1] if key_only else frame).take(rows)
+	table = state['tables'][side]
+	if key_only:
+		table = table.select([0])
+	frame = table.take(rows).to_pandas(integer_object_nulls=True)
+	frame.columns = state['columns'][:frame.shape[1]]
+	# Arrow 往返后类型可能变化（如 object 列变为 str），恢复为原类型，保证差异判断与串行路径一致
+	for position, dtype in enumerate(state['dtypes'][side][:frame.shape[1]]):
+		if frame.dtypes.iloc[position] != dtype:
+			frame.isetitem(position, frame.iloc[:, position].astype(dtype))
+	return frame
+
+
+def _partition_buckets(keys1, keys2, num_partitions):
+	"""按比较列的哈希值为两侧的每一行分配分区编号，能被合并匹配的键一定落在同一分区"""
+	if pd.api.types.is_numeric_dtype(keys1.dtype) and pd.api.types.is_numeric_dtype(keys2.dtype):
+		# 整数键与浮点键可以互相匹配（1 与 1.0），统一按浮点数取哈希
+		keys1 = keys1.astype('float64')
+		keys2 = keys2.astype('float64')
+	elif keys1.dtype != keys2.dtype:
+		keys1 = keys1.astype(str)
+		keys2 = keys2.astype(str)
+	# 分区编号用最小的整数类型保存，传输量小，_partition_rows 的稳定排序也更快
+	dtype = np.min_scalar_type(num_partitions - 1)
+	buckets1 = (pd.util.hash_pandas_object(keys1, index=False).to_numpy() % num_partitions).astype(dtype)
+	buckets2 = (pd.util.hash_pandas_object(keys2, index=False).to_numpy() % num_partitions).astype(dtype)
+	return buckets1, buckets2
+
+
+def _hash_partition_slice(token, index, num_slices):
+	"""工作进程入口：为两侧各自的第 index 段行（共 num_slices 段）计算分区编号"""
+	state = _PARTITION_STATE[token]
+	keys = []
+	for side, total in enumerate(state['lengths']):
+		rows = np.arange(total * index // num_slices, total * (index + 1) // num_slices)
+		keys.append(_partition_frame(state, side, rows, key_only=True).iloc[:, 0])
+	return _partition_buckets(keys[0], keys[1], state['num_partitions'])
+
+
+def _partition_rows(buckets, num_partitions):
+	"""返回每个分区的行位置数组（分区内保持原始行顺序）"""
+	order = np.argsort(buckets, kind='stable')
+	bounds = np.searchsorted(buckets[order], np.arange(num_partitions + 1))
+	return [order[bounds[i]:bounds[i + 1]] for i in range(num_partitions)]
+
+
+def _row_order(primary, secondary, bound):
+	"""行位置对的稳定排序：先按 primary 再按 secondary，缺失（-1）的排在最后，与串行路径的 sort_values 一致
+	bound 大于所有行位置；输入由若干段已排好序的结果拼接而成时，稳定排序只需归并各段
+	"""
+	primary = np.where(primary < 0, bound, primary).astype(np.int64)
+	secondary = np.where(secondary < 0, bound, secondary).astype(np.int64)
+	return np.argsort(primary * (bound + 1) + secondary, kind='stable')
+
+
+def _take_rows(series, positions):
+	"""按行位置取值，位置为 -1 处填充空值（类型提升与 pd.merge 对未匹配行的处理一致）"""
+	values = pd.api.extensions.take(series.array, positions, allow_fill=True)
+	return pd.Series(values, name=series.name)
+
+
+def _take_keys(left_keys, right_keys, left_rows, right_rows):
+	"""按行位置取比较列：outer 合并时只存在于右侧的行取右侧的键"""
+	missing = np.flatnonzero(left_rows < 0)
+	if len(missing) == 0:
+		return _take_rows(left_keys, left_rows)
+	present = np.flatnonzero(left_rows >= 0)
+	keys = pd.concat([
+		_take_rows(left_keys, left_rows[present]), _take_rows(right_keys, right_rows[missing]),
+	], ignore_index=True)
+	return keys.take(np.argsort(np.concatenate([present, missing]), kind='stable')).reset_index(drop=True)
+
+
+def _match_partition(part1, part2, rows1, rows2, comparison_column, preserve_order_by, common_columns, column_rules,
+		bound):
+	"""匹配并对比一个分区，只返回匹配到的行位置对和差异掩码，不返回合并后的数据
+	参数:
+	  part1, part2: 分区内两侧的比较列和公共列
+	  rows1, rows2: 分区内各行在 df1、df2 中的行位置
+	  bound: 大于两侧所有行位置的数，用于排序
+	返回:
+	  (df1 行位置, df2 行位置, 差异掩码矩阵)，缺失的一侧行位置为 -1，掩码矩阵每行对应 common_columns 中的一列；
+	  已按 preserve_order_by 对应的行顺序排好序，主进程只需归并各分区的结果
+	"""
+	local1 = pd.DataFrame({comparison_column: part1[comparison_column], '_position_1': np.arange(len(part1))})
+	local2 = pd.DataFrame({comparison_column: part2[comparison_column], '_position_2': np.arange(len(part2))})
+	if preserve_order_by == 'df2':
+		matched = pd.merge(local2, local1, on=comparison_column, how='left')
+	else:
+		matched = pd.merge(local1, local2, on=comparison_column, how='left' if preserve_order_by == 'df1' else 'outer')
+	positions1 = matched['_position_1'].fillna(-1).to_numpy(dtype=np.int64)
+	positions2 = matched['_position_2'].fillna(-1).to_numpy(dtype=np.int64)
+
+	masks = np.zeros((len(common_columns), len(matched)), dtype=bool)
+	for i, col in enumerate(common_columns):
+		rule = _resolve_rule(column_rules, f"{col}")
+		masks[i] = _column_difference(_take_rows(part1[col], positions1), _take_rows(part2[col], positions2), rule)
+	rows1 = np.where(positions1 >= 0, rows1[np.maximum(positions1, 0)], -1) if len(rows1) else np.full(len(matched), -1)
+	rows2 = np.where(positions2 >= 0, rows2[np.maximum(positions2, 0)], -1) if len(rows2) else np.full(len(matched), -1)
+	order = _row_order(rows2, rows1, bound) if preserve_order_by == 'df2' else _row_order(rows1, rows2, bound)
+	return rows1[order], rows2[order], masks[:, order]
+
+
+def _match_partition_task(token, rows1, rows2):
+	"""工作进程入口：从继承或内存映射的输入中取出一个分区两侧的行再匹配"""
+	state = _PARTITION_STATE[token]
+	return _match_partition(_partition_frame(state, 0, rows1), _partition_frame(state, 1, rows2), rows1, rows2,
+		state['comparison_column'], state['preserve_order_by'], state['common_columns'], state['column_rules'],
+		state['bound'])
+
+
+def _assemble_merged(df1, df2, rows1, rows2, comparison_column, preserve_order_by, map_columns=map):
+	"""按已排好序的行位置对组装合并结果，每一列对每一侧只做一次 take
+	列名、列顺序和类型与 _merge_rows 的结果一致；列名冲突（pd.merge 会报错）时返回 None
+	map_columns: 执行各列 take 的 map 函数，传入线程池的 map 时各列并行组装
+	"""
+	if preserve_order_by == 'df2':
+		left, right, left_rows, right_rows, suffix = df2, df1, rows2, rows1, '_1'
+		left_index, right_index = '_original_row_index_2', '_original_row_index_1'
+	else:
+		left, right, left_rows, right_rows, suffix = df1, df2, rows1, rows2, '_2'
+		left_index, right_index = '_original_row_index_1', '_original_row_index_2'
+
+	# 与 pd.merge 一样，两侧同名的列都按加后缀后的字符串命名（左侧后缀为空）
+	overlap = set(left.columns) & set(right.columns) - {comparison_column}
+	tasks = {}
+	for name in left.columns:
+		if name == comparison_column:
+			tasks[name] = (_take_keys, left[name], right[name], left_rows, right_rows)
+			continue
+		output_name = f"{name}" if name in overlap else name
+		if output_name in tasks:
+			return None
+		tasks[output_name] = (_take_rows, left[name], left_rows)
+	tasks[left_index] = (_take_rows, pd.Series(np.arange(len(left))), left_rows)
+	for name in right.columns:
+		if name == comparison_column:
+			continue
+		output_name = f"{name}{suffix}" if name in overlap else name
+		if output_name in tasks:
+			return None
+		tasks[output_name] = (_take_rows, right[name], right_rows)
+	tasks[right_index] = (_take_rows, pd.Series(np.arange(len(right))), right_rows)
+
+	columns = map_columns(lambda task: task[0](*task[1:]), tasks.values())
+	# 各列已是新数组，不再合并为二维块（合并会把同类型的列再复制一遍）
+	return pd.DataFrame(dict(zip(tasks, columns)), copy=False)
+
+
+def merge_and_reorder_parallel(df1, df2, comparison_column, preserve_order_by=None, column_sort_strategy='alternating',
+		workers=None, column_rules=None, min_rows=100000):
+	"""多核版本的 merge_and_reorder：按比较列哈希分区，各分区并行匹配行并计算差异，再按行顺序策略组装结果
+	结果与 merge_and_reorder + compute_difference_masks 的串行结果一致
+	参数:
+	  preserve_order_by, column_sort_strategy: 同 merge_and_reorder
+	  workers: 并行数，默认使用 CPU 核数
+	  column_rules: 比较规则，同 compute_difference_masks
+	  min_rows: 两侧行数之和低于该值时直接走串行路径
+	返回:
+	  merged_df, column_pairs, diff_masks
+	说明:
+	  比较列的哈希、各分区的匹配和差异计算都在工作进程中进行；工作进程返回已排好序的
+	  (df1 行位置, df2 行位置) 和差异掩码，主进程只归并各分区的有序结果，
+	  再在线程池中按列并行 take 组装结果（numpy/Arrow 的 take 会释放 GIL，线程间不复制数据）；
+	  调用方是单线程且支持 fork 时工作进程通过 fork 继承输入数据（写时复制）；
+	  多线程调用方（GUI、HTTP 服务）或不支持 fork 的平台（如 Windows）使用 forkserver/spawn 进程池，
+	  输入只写一次 Arrow IPC 文件，由工作进程内存映射后按分区取行，
+	  无法写成 Arrow 的输入（未安装 pyarrow、混合类型列）退回为逐个分区序列化传送；
+	  使用 forkserver/spawn 时调用方脚本需要有 if __name__ == '__main__' 保护
+	"""
+	workers = workers or os.cpu_count() or 1
+	if (workers <= 1 or len(df1) + len(df2) < min_rows
+			or df1.columns.has_duplicates or df2.columns.has_duplicates):
+		merged_df, column_pairs = merge_and_reorder(df1, df2, comparison_column, preserve_order_by, column_sort_strategy)
+		return merged_df, column_pairs, compute_difference_masks(merged_df, column_pairs, column_rules)
+
+	df1_cols = list(df1.columns)
+	df2_cols = list(df2.columns)
+	common_columns = [col for col in df1_cols if col in df2_cols and col != comparison_column]
+	compared = [comparison_column] + common_columns
+	frames = [df1[compared], df2[compared]]
+	bound = len(df1) + len(df2)
+	state = {
+		'columns': compared, 'lengths': [len(df1), len(df2)], 'num_partitions': workers, 'bound': bound,
+		'comparison_column': comparison_column, 'preserve_order_by': preserve_order_by,
+		'common_columns': common_columns, 'column_rules': column_rules,
+	}
+
+	context = _parallel_context()
+	token = next(_PARTITION_TOKENS)
+	paths = []
+	executor_options = {}
+	if context.get_start_method() == 'fork':
+		state['frames'] = frames
+		_PARTITION_STATE[token] = state
+	else:
+		paths = _write_shared_frames(frames) or []
+		if paths:
+			state.update(paths=paths, dtypes=[list(frame.dtypes) for frame in frames])
+			executor_options = {'initializer': _load_partition_state, 'initargs': (token, state)}
+	try:
+		with ProcessPoolExecutor(max_workers=workers, mp_context=context, **executor_options) as executor:
+			if token in _PARTITION_STATE or paths:
+				slices = list(executor.map(_hash_partition_slice, [token] * workers, range(workers), [workers] * workers))
+				rows1 = _partition_rows(np.concatenate([part[0] for part in slices]), workers)
+				rows2 = _partition_rows(np.concatenate([part[1] for part in slices]), workers)
+				parts = list(executor.map(_match_partition_task, [token] * workers, rows1, rows2))
+			else:
+				# 输入无法写成 Arrow 文件时逐个分区序列化传送
+				buckets1, buckets2 = _partition_buckets(df1[comparison_column], df2[comparison_column], workers)
+				rows1 = _partition_rows(buckets1, workers)
+				rows2 = _partition_rows(buckets2, workers)
+				futures = [
+					executor.submit(_match_partition, frames[0].take(rows1[i]), frames[1].take(rows2[i]),
+						rows1[i], rows2[i], comparison_column, preserve_order_by, common_columns, column_rules, bound)
+					for i in range(workers)
+				]
+				parts = [future.result() for future in futures]
+	finally:
+		_PARTITION_STATE.pop(token, None)
+		_remove_files(paths)
+
+	positions1 = np.concatenate([part[0] for part in parts])
+	positions2 = np.concatenate([part[1] for part in parts])
+	masks = np.concatenate([part[2] for part in parts], axis=1)
+
+	# 各分区已排好序，这里的稳定排序只归并各段
+	if preserve_order_by == 'df2':
+		order = _row_order(positions2, positions1, bound)
+	else:
+		order = _row_order(positions1, positions2, bound)
+	positions1 = positions1[order]
+	positions2 = positions2[order]
+
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		masks = list(pool.map(np.take, masks, itertools.repeat(order)))
+		merged_df = _assemble_merged(df1, df2, positions1, positions2, comparison_column, preserve_order_by, pool.map)
+	if merged_df is None:
+		merged_df, column_pairs = merge_and_reorder(df1, df2, comparison_column, preserve_order_by, column_sort_strategy)
+		return merged_df, column_pairs, compute_difference_masks(merged_df, column_pairs, column_rules)
+	merged_df, column_pairs = _finalize_merged(merged_df, df1_cols, df2_cols, comparison_column,
+		preserve_order_by, column_sort_strategy, presorted=True)
+
+	# 成对列名由合并后的（字符串）列名构成，掩码按同样的名称对应
+	masks_by_column = {f"{col}": mask for col, mask in zip(common_columns, masks)}
+	diff_masks = {pair: masks_by_column[_pair_base_name(*pair)] for pair in column_pairs}
+	return merged_df, column_pairs, diff_masks
+
+
+class KeyIndex:
+	"""一张表比较列的键索引：去重键的哈希表和每个键对应的行位置
+	常驻内存的表（如对比服务中的基准表）建立一次后，可反复用 merge_and_reorder_indexed 与其他表对齐，
+	每次只需在哈希表中查找另一张表的键
+	"""
+
+	def __init__(self, keys):
+		self.unique_keys = pd.Index(pd.unique(keys))
+		# 每行的键编号，以及按键编号分组后的行位置（组内保持原始行顺序）
+		self.codes = self.unique_keys.get_indexer(keys)
+		self.rows = np.argsort(self.codes, kind='stable')
+		self.starts = np.searchsorted(self.codes[self.rows], np.arange(len(self.unique_keys) + 1))
+
+	@property
+	def nbytes(self):
+		return int(self.unique_keys.memory_usage(deep=True)) + self.codes.nbytes + self.rows.nbytes + self.starts.nbytes
 
-				# 如果值不同，高亮显示
-				if value1 != value2:
-					sheet.cell(row=row, column=col1_index).fill = fill
-					sheet.cell(row=row, column=col2_index).fill = fill
-					highlighted_cells += 2
+	def align(self, keys, how='outer'):
+		"""把另一张表的比较列与本表对齐，返回行位置对 (本表行位置, keys 的行位置)，缺失的一侧为 -1
+		how: 'outer' | 'left'（只保留本表的行）| 'right'（只保留 keys 的行），与 pd.merge 以本表为左表时相同；
+		重复键按 pd.merge 的规则两两配对
+		"""
+		key_ids = self.unique_keys.get_indexer(keys)
+		matched = key_ids >= 0
+		counts = np.zeros(len(key_ids), dtype=np.int64)
+		counts[matched] = np.diff(self.starts)[key_ids[matched]]
+		other_rows = np.repeat(np.arange(len(key_ids)), counts)
+		offsets = np.arange(len(other_rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+		own_rows = self.rows[np.repeat(self.starts[np.maximum(key_ids, 0)], counts) + offsets]
+		if how in ('outer', 'right'):
+			unmatched = np.flatnonzero(~matched)
+			own_rows = np.concatenate([own_rows, np.full(len(unmatched), -1)])
+			other_rows = np.concatenate([other_rows, unmatched])
+		if how in ('outer', 'left'):
+			seen = np.zeros(len(self.unique_keys), dtype=bool)
+			seen[key_ids[matched]] = True
+			unmatched = np.flatnonzero(~seen[self.codes])
+			own_rows = np.concatenate([own_rows, unmatched])
+			other_rows = np.concatenate([other_rows, np.full(len(unmatched), -1)])
+		return own_rows, other_rows
+
+	def key_changes(self, keys):
+		"""返回 (keys 中新增的键数, 本表中被删除的键数)，按去重后的键计数"""
+		matched = self.unique_keys.get_indexer(pd.unique(keys)) >= 0
+		return int((~matched).sum()), int(len(self.unique_keys) - matched.sum())
+
+
+def merge_and_reorder_indexed(df1, key_index, df2, comparison_column, preserve_order_by=None,
+		column_sort_strategy='alternating'):
+	"""与 merge_and_reorder 相同，但 df1 的比较列已预先建立 KeyIndex(df1[comparison_column])
+	只在索引中查找 df2 的键得到行位置对，再每列每侧 take 一次组装结果，不再对 df1 做 pd.merge，
+	耗时主要取决于 df2 和结果的大小；结果与 merge_and_reorder 一致
+	两侧比较列类型不一致（数值类型之间除外）或列名重复时退回 merge_and_reorder，与 pd.merge 的匹配和报错保持一致
+	"""
+	keys1 = df1[comparison_column]
+	keys2 = df2[comparison_column]
+	numeric = all(
+		pd.api.types.is_numeric_dtype(keys.dtype) and not pd.api.types.is_bool_dtype(keys.dtype)
+		for keys in (keys1, keys2)
+	)
+	if ((keys1.dtype == keys2.dtype or numeric)
+			and not df1.columns.has_duplicates and not df2.columns.has_duplicates):
+		how = {'df1': 'left', 'df2': 'right'}.get(preserve_order_by, 'outer')
+		rows1, rows2 = key_index.align(keys2, how)
+		bound = len(df1) + len(df2)
+		if preserve_order_by == 'df2':
+			order = _row_order(rows2, rows1, bound)
+		else:
+			order = _row_order(rows1, rows2, bound)
+		merged_df = _assemble_merged(df1, df2, rows1[order], rows2[order], comparison_column, preserve_order_by)
+		if merged_df is not None:
+			return _finalize_merged(merged_df, list(df1.columns), list(df2.columns), comparison_column,
+				preserve_order_by, column_sort_strategy, presorted=True)
+	return merge_and_reorder(df1, df2, comparison_column, preserve_order_by, column_sort_strategy)
+
+
+def _highlight_sheet(sheet, column_pairs, diff_masks, mark_both=True):
+	"""按差异掩码为工作表中的成对列填充高亮，返回高亮的单元格数
+	mark_both 为 False 时只高亮每对中的第二列（多版本对比中发生变化的一侧）
+	"""
+	# 设置高亮样式（黄色填充）
+	fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+	# 预先构建列名到列索引的映射
+	col_mapping = {}
+	for cell in sheet[1]:
+		if cell.value is not None:
+			col_mapping[cell.value] = cell.col_idx
+
+	highlighted_cells = 0
+	for col1, col2 in column_pairs:
+		if col1 not in col_mapping or col2 not in col_mapping:
+			continue
+		col1_index = col_mapping[col1]
+		col2_index = col_mapping[col2]
+		# 只访问不同的行（第1行为标题行）
+		for row in np.flatnonzero(diff_masks[(col1, col2)]) + 2:
+			if mark_both:
+				sheet.cell(row=int(row), column=col1_index).fill = fill
+				highlighted_cells += 1
+			sheet.cell(row=int(row), column=col2_index).fill = fill
+			highlighted_cells += 1
+	return highlighted_cells
+
+
+def highlight_differences(output_path, column_pairs, diff_masks=None, column_rules=None, mark_both=True):
+	"""在 Excel 中高亮显示不同的值
+	参数:
+	  diff_masks: compute_difference_masks 的结果；为 None 时从输出文件重新读取并计算
+	  column_rules: 未提供 diff_masks 时使用的比较规则
+	  mark_both: 是否同时高亮成对的两列
+	"""
+	try:
+		if diff_masks is None:
+			diff_masks = compute_difference_masks(pd.read_excel(output_path), column_pairs, column_rules)
+
+		# 打开 Excel 文件
+		workbook = load_workbook(output_path)
+		sheet = workbook.active
+		highlighted_cells = _highlight_sheet(sheet, column_pairs, diff_masks, mark_both)
 
 		# 保存文件
 		workbook.save(output_path)
@@ -197,6 +902,162 @@ def highlight_differences(output_path, column_pairs):
 		print(f"高亮显示出错: {e}")
 
 
+class DifferenceSummary:
+	"""差异汇总报告的流式聚合器
+	逐块累加每列的差异行数、空值与非空值差异、新增/删除的键数和示例键，
+	只保存计数和少量示例键，内存占用与数据量无关
+	列差异只统计两侧都存在的行，新增/删除的行单独计入 added_keys / removed_keys
+	"""
+
+	def __init__(self, key_column, sample_size=5, column_rules=None):
+		self.key_column = key_column
+		self.sample_size = sample_size
+		self.column_rules = column_rules
+		self.total_rows = 0
+		self.rows_with_differences = 0
+		self.added_keys = {'count': 0, 'sample_keys': []}
+		self.removed_keys = {'count': 0, 'sample_keys': []}
+		self.columns = {}
+
+	def _take_samples(self, samples, keys):
+		"""补充示例键，最多保留 sample_size 个"""
+		need = self.sample_size - len(samples)
+		if need > 0:
+			samples.extend(keys[:need].tolist())
+
+	def update(self, merged_df, column_pairs, diff_masks, matched=None):
+		"""累加一块合并结果的差异统计
+		matched: 两侧都存在的行的布尔数组；为 None 时由两侧原始行索引列判断（见 _matched_rows）
+		"""
+		self.total_rows += len(merged_df)
+		if len(merged_df) == 0:
+			return
+		if matched is None:
+			matched = _matched_rows(merged_df)
+		keys = merged_df[self.key_column].to_numpy(dtype=object)
+		any_difference = np.zeros(len(merged_df), dtype=bool)
+		for col1, col2 in column_pairs:
+			base_col = _pair_base_name(col1, col2)
+			stats = self.columns.setdefault(base_col, {
+				'mismatches': 0, 'null_vs_value': 0, 'value_changed': 0, 'sample_keys': [],
+			})
+			mask = diff_masks[(col1, col2)] & matched
+			any_difference |= mask
+			rows = np.flatnonzero(mask)
+			if len(rows) == 0:
+				continue
+			# 只在差异行上区分“一侧为空”与“两侧值不同”，空值判断与该列的比较规则一致
+			rule = _resolve_rule(self.column_rules, base_col)
+			null1 = _null_mask(merged_df[col1].iloc[rows], rule)
+			null2 = _null_mask(merged_df[col2].iloc[rows], rule)
+			null_vs_value = int(np.count_nonzero(null1 != null2))
+			stats['mismatches'] += len(rows)
+			stats['null_vs_value'] += null_vs_value
+			stats['value_changed'] += len(rows) - null_vs_value
+			self._take_samples(stats['sample_keys'], keys[rows])
+		self.rows_with_differences += int(np.count_nonzero(any_difference))
+
+	def update_keys(self, added_keys, removed_keys):
+		"""累加只存在于文件2（新增）和只存在于文件1（删除）的键"""
+		for stats, keys in ((self.added_keys, added_keys), (self.removed_keys, removed_keys)):
+			keys = np.asarray(keys, dtype=object)
+			stats['count'] += len(keys)
+			self._take_samples(stats['sample_keys'], keys)
+
+	def to_dict(self):
+		"""转为可序列化为 JSON 的字典"""
+		return {
+			'key_column': self.key_column,
+			'total_rows': self.total_rows,
+			'rows_with_differences': self.rows_with_differences,
+			'added_keys': self.added_keys,
+			'removed_keys': self.removed_keys,
+			'columns': [
+				{'column': column, **stats} for column, stats in self.columns.items()
+			],
+		}
+
+	def to_frame(self):
+		"""每列一行的差异汇总表"""
+		return pd.DataFrame([
+			{
+				'列': column,
+				'差异行数': stats['mismatches'],
+				'一侧为空': stats['null_vs_value'],
+				'值不同': stats['value_changed'],
+				'示例键': ', '.join(str(key) for key in stats['sample_keys']),
+			}
+			for column, stats in self.columns.items()
+		], columns=['列', '差异行数', '一侧为空', '值不同', '示例键'])
+
+	def overview_frame(self):
+		"""总体统计表"""
+		return pd.DataFrame([
+			{'项目': '比较列', '值': self.key_column},
+			{'项目': '合并后总行数', '值': self.total_rows},
+			{'项目': '存在差异的行数', '值': self.rows_with_differences},
+			{'项目': '新增键数（仅文件2）', '值': self.added_keys['count']},
+			{'项目': '新增示例键', '值': ', '.join(str(key) for key in self.added_keys['sample_keys'])},
+			{'项目': '删除键数（仅文件1）', '值': self.removed_keys['count']},
+			{'项目': '删除示例键', '值': ', '.join(str(key) for key in self.removed_keys['sample_keys'])},
+		])
+
+	def save(self, output_path):
+		"""输出 JSON、Excel 和 HTML 三种格式的汇总报告（扩展名由本方法决定）"""
+		base_path = os.path.splitext(output_path)[0]
+		try:
+			with open(f"{base_path}.json", 'w', encoding='utf-8') as f:
+				json.dump(self.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+			with pd.ExcelWriter(f"{base_path}.xlsx", engine='openpyxl') as writer:
+				self.overview_frame().to_excel(writer, sheet_name='概览', index=False)
+				self.to_frame().to_excel(writer, sheet_name='列差异', index=False)
+			with open(f"{base_path}.html", 'w', encoding='utf-8') as f:
+				f.write('<html><head><meta charset="utf-8"><title>差异汇总</title></head><body>\n')
+				f.write('<h2>概览</h2>\n' + self.overview_frame().to_html(index=False) + '\n')
+				f.write('<h2>列差异</h2>\n' + self.to_frame().to_html(index=False) + '\n')
+				f.write('</body></html>\n')
+			print(f"差异汇总报告已保存到: {base_path}.json / .xlsx / .html")
+		except Exception as e:
+			print(f"保存差异汇总报告时出错: {e}")
+
+
+def _key_changes(df1, df2, comparison_column):
+	"""返回 (仅存在于 df2 的键, 仅存在于 df1 的键)"""
+	keys1 = df1[comparison_column]
+	keys2 = df2[comparison_column]
+	added = keys2[~keys2.isin(keys1)].drop_duplicates().to_numpy(dtype=object)
+	removed = keys1[~keys1.isin(keys2)].drop_duplicates().to_numpy(dtype=object)
+	return added, removed
+
+
+def _matched_rows(merged_df, comparison_column=None, df1=None, df2=None):
+	"""合并结果中两侧都存在的行（布尔数组）
+	两侧原始行索引列都在时按是否同时非空判断；
+	preserve_order_by 只保留了一侧索引列时，按键是否同时出现在 df1 和 df2 中判断；
+	都无法判断时视为全部行两侧都存在
+	"""
+	if '_df1_original_index' in merged_df.columns and '_df2_original_index' in merged_df.columns:
+		return (merged_df['_df1_original_index'].notna() & merged_df['_df2_original_index'].notna()).to_numpy()
+	if df1 is not None and df2 is not None:
+		keys = merged_df[comparison_column]
+		return (keys.isin(df1[comparison_column]) & keys.isin(df2[comparison_column])).to_numpy()
+	return np.ones(len(merged_df), dtype=bool)
+
+
+def _summarize_merged(summary, merged_df, column_pairs, column_rules, diff_masks=None, chunk_rows=100000,
+		matched=None):
+	"""把合并结果累加到汇总中；未提供差异掩码时按行块计算，避免一次性生成全部掩码"""
+	if matched is None:
+		matched = _matched_rows(merged_df)
+	if diff_masks is not None:
+		summary.update(merged_df, column_pairs, diff_masks, matched)
+		return
+	for start in range(0, len(merged_df), chunk_rows):
+		chunk = merged_df.iloc[start:start + chunk_rows]
+		summary.update(chunk, column_pairs, compute_difference_masks(chunk, column_pairs, column_rules),
+			matched[start:start + chunk_rows])
+
+
 def save_to_excel(df, output_path):
 	"""保存 DataFrame 到 Excel 文件"""
 	try:
@@ -206,7 +1067,158 @@ def save_to_excel(df, output_path):
 		print(f"保存 Excel 文件时出错: {e}")
 
 
-def data_comparison(col, file1, file2, preserve_order_by, column_sort_strategy, output_path):
+def summary_comparison_chunked(col, file1, file2, chunksize=200000, num_partitions=None, column_rules=None,
+		sample_size=5, workers=None):
+	"""在有限内存内为超大文件生成差异汇总
+	两个文件按比较列哈希分块切分到临时目录，再逐个分区合并、计算差异并累加到汇总中，
+	内存占用只取决于单个分区的大小；分块模式下比较列规范为两侧一致的文本键（1、1.0、'1' 均为 '1'）
+	参数:
+	  chunksize: 每次读取的行数
+	  num_partitions: 分区数，默认按两个文件的总大小估算（约每 64 MB 一个分区）
+	  workers: 大于 1 时每个分区用 merge_and_reorder_parallel 多核合并与对比
+	返回:
+	  DifferenceSummary
+	"""
+	if num_partitions is None:
+		total_size = os.path.getsize(file1) + os.path.getsize(file2)
+		num_partitions = max(1, total_size // (64 * 1024 * 1024))
+
+	summary = DifferenceSummary(col, sample_size, column_rules)
+	with tempfile.TemporaryDirectory(prefix='table_comparison_') as spill_dir:
+		partitions1, columns1 = module.files.partition_file_by_key(file1, col, num_partitions, spill_dir, 'df1', chunksize)
+		partitions2, columns2 = module.files.partition_file_by_key(file2, col, num_partitions, spill_dir, 'df2', chunksize)
+		print(f"已按比较列切分为 {num_partitions} 个分区")
+
+		for paths1, paths2 in zip(partitions1, partitions2):
+			part1 = module.files.load_partition(paths1, columns1).drop(columns='_original_row_index', errors='ignore')
+			part2 = module.files.load_partition(paths2, columns2).drop(columns='_original_row_index', errors='ignore')
+			if len(part1) == 0 and len(part2) == 0:
+				continue
+			summary.update_keys(*_key_changes(part1, part2, col))
+			if workers and workers > 1:
+				merged_df, column_pairs, diff_masks = merge_and_reorder_parallel(
+					part1, part2, col, workers=workers, column_rules=column_rules)
+			else:
+				merged_df, column_pairs = merge_and_reorder(part1, part2, col)
+				diff_masks = None
+			_summarize_merged(summary, merged_df, column_pairs, column_rules, diff_masks)
+	return summary
+
+
+def _compare_partition(part1, part2, col, preserve_order_by, column_sort_strategy, column_rules, workers=None,
+		summary=None):
+	"""对比一个分区：合并、计算差异，并把分区内的行索引换算回原文件的行号
+	workers: 大于 1 时用 merge_and_reorder_parallel 多核合并与对比
+	summary: DifferenceSummary，提供时把本分区的键变化和差异累加进去
+	"""
+	row_index1 = part1.pop('_original_row_index').to_numpy()
+	row_index2 = part2.pop('_original_row_index').to_numpy()
+	if workers and workers > 1:
+		merged_df, column_pairs, diff_masks = merge_and_reorder_parallel(
+			part1, part2, col, preserve_order_by, column_sort_strategy, workers, column_rules)
+	else:
+		merged_df, column_pairs = merge_and_reorder(part1, part2, col, preserve_order_by, column_sort_strategy)
+		diff_masks = compute_difference_masks(merged_df, column_pairs, column_rules)
+	if summary is not None:
+		summary.update_keys(*_key_changes(part1, part2, col))
+		summary.update(merged_df, column_pairs, diff_masks, _matched_rows(merged_df, col, part1, part2))
+
+	for name, row_index in (('_df1_original_index', row_index1), ('_df2_original_index', row_index2)):
+		if name in merged_df.columns:
+			local = merged_df[name].to_numpy(dtype=float)
+			present = ~np.isnan(local)
+			values = np.full(len(merged_df), np.nan)
+			values[present] = row_index[local[present].astype(np.int64)]
+			merged_df[name] = values
+
+	# CSV 无法高亮，用一列列出每行存在差异的列名
+	diff_columns = np.full(len(merged_df), '', dtype=object)
+	for (col1, col2), mask in diff_masks.items():
+		diff_columns[mask] += f"{_pair_base_name(col1, col2)};"
+	merged_df['_diff_columns'] = [value.rstrip(';') for value in diff_columns]
+	return merged_df
+
+
+def pipeline_comparison(col, file1, file2, output_path, preserve_order_by=None, column_sort_strategy='alternating',
+		chunksize=200000, num_partitions=None, queue_size=2, column_rules=None, summary_path=None, workers=None):
+	"""以流水线方式对比两个大文件并输出 CSV，读取、对比、写出在不同线程中并发进行
+	第一段流水线: 读取（分块预读） -> 切分（按比较列哈希写入分区文件）
+	第二段流水线: 加载分区 -> 对比（合并并计算差异） -> 写出（追加到输出 CSV）
+	阶段之间用容量为 queue_size 的有界队列连接，内存占用保持平稳
+	参数:
+	  output_path: 输出 CSV 路径；差异以 _diff_columns 列记录（CSV 无法高亮）
+	  preserve_order_by, column_sort_strategy, column_rules: 同 data_comparison
+	  chunksize, num_partitions: 同 summary_comparison_chunked
+	  queue_size: 阶段间队列容量
+	  summary_path: 差异汇总报告路径，提供时在对比阶段逐分区累加汇总并在结束后保存（比较列为规范化后的文本键）
+	  workers: 大于 1 时每个分区用 merge_and_reorder_parallel 多核合并与对比
+	返回:
+	  {'partition': [...], 'compare': [...]}  两段流水线各阶段的吞吐和阻塞时间
+	说明:
+	  两段流水线先后执行，不会重叠：任一分区都可能含有两个文件中任意位置的行，
+	  必须等两个文件全部读完、切分完才能开始对比，因此总耗时约为
+	  第一段最慢阶段的耗时 + 第二段最慢阶段的耗时，每段内部各阶段并发进行；
+	  输出按分区依次写出，分区内按 preserve_order_by 排序；
+	  _df1_original_index / _df2_original_index 为原文件中的行号，可用于恢复全局顺序
+	"""
+	if num_partitions is None:
+		total_size = os.path.getsize(file1) + os.path.getsize(file2)
+		num_partitions = max(4, total_size // (64 * 1024 * 1024))
+
+	started = time.perf_counter()
+	report = {}
+	with tempfile.TemporaryDirectory(prefix='table_comparison_') as spill_dir:
+		partitions = {'df1': [[] for _ in range(num_partitions)], 'df2': [[] for _ in range(num_partitions)]}
+		columns = {'df1': [], 'df2': []}
+
+		def read_chunks():
+			for side, file_path in (('df1', file1), ('df2', file2)):
+				chunks = module.files.iter_file_chunks(file_path, chunksize, dtype={col: str})
+				for chunk_number, chunk in enumerate(chunks):
+					yield side, chunk_number, chunk
+
+		def spill(item):
+			side, chunk_number, chunk = item
+			columns[side] = module.files.spill_chunk_by_key(
+				chunk, chunk_number, chunksize, col, num_partitions, spill_dir, side, partitions[side])
+
+		report['partition'] = module.pipeline.run_pipeline(('读取', read_chunks), [('切分', spill)], queue_size)
+
+		def load_partitions():
+			for partition in range(num_partitions):
+				part1 = module.files.load_partition(partitions['df1'][partition], columns['df1'])
+				part2 = module.files.load_partition(partitions['df2'][partition], columns['df2'])
+				if len(part1) or len(part2):
+					yield part1, part2
+
+		summary = DifferenceSummary(col, column_rules=column_rules) if summary_path else None
+
+		def compare(item):
+			return _compare_partition(*item, col, preserve_order_by, column_sort_strategy, column_rules, workers, summary)
+
+		with open(output_path, 'w', encoding='utf-8-sig', newline='') as output:
+			output_columns = []
+
+			def write(merged_df):
+				if not output_columns:
+					output_columns.extend(merged_df.columns)
+					merged_df.to_csv(output, index=False)
+				else:
+					merged_df.reindex(columns=output_columns).to_csv(output, index=False, header=False)
+
+			report['compare'] = module.pipeline.run_pipeline(
+				('加载分区', load_partitions), [('对比', compare), ('写出', write)], queue_size)
+
+	module.pipeline.print_stage_report("切分阶段统计:", report['partition'])
+	module.pipeline.print_stage_report("对比阶段统计:", report['compare'], time.perf_counter() - started)
+	print(f"对比结果已保存到: {output_path}")
+	if summary is not None:
+		summary.save(summary_path)
+	return report
+
+
+def data_comparison(col, file1, file2, preserve_order_by, column_sort_strategy, output_path, column_rules=None,
+		summary_path=None, summary_only=False, chunksize=None, workers=None):
 	"""对比两个文件并输出拼接结果到 Excel，并高亮显示不同
 	参数:
 	  col: 比较列名
@@ -214,7 +1226,27 @@ def data_comparison(col, file1, file2, preserve_order_by, column_sort_strategy,
 	  preserve_order_by: None | 'df1' | 'df2'  行顺序保留策略
 	  column_sort_strategy: 'alternating' | 'grouped' | 'alphabetical'  列排序策略
 	  output_path: 输出Excel路径
+	  column_rules: {列名: 规则字典}  按列的比较规则（容差、忽略大小写、日期解析、忽略列等）
+	  summary_path: 差异汇总报告路径（输出同名的 .json/.xlsx/.html），None 表示不输出
+	  summary_only: 只输出差异汇总报告，不生成高亮的对比工作簿
+	  chunksize: 与 summary_only 同时使用时按块分区处理，内存占用有上限；
+	    输出路径为 .csv 时改用 pipeline_comparison 流水线对比；其他情况下不生效
+	  workers: 大于 1 时使用 merge_and_reorder_parallel 多核合并与对比（分块模式下逐分区使用）
 	"""
+	if summary_only and summary_path is None:
+		summary_path = f"{os.path.splitext(output_path)[0]}_summary"
+
+	if summary_only and chunksize:
+		summary = summary_comparison_chunked(col, file1, file2, chunksize, column_rules=column_rules, workers=workers)
+		summary.save(summary_path)
+		return
+
+	if chunksize and output_path.lower().endswith('.csv'):
+		pipeline_comparison(col, file1, file2, output_path, preserve_order_by, column_sort_strategy,
+			chunksize, column_rules=column_rules, summary_path=summary_path, workers=workers)
+		return
+	if chunksize:
+		print("chunksize 只在 summary_only 或输出为 .csv 时生效，本次按整表读取对比")
 
 	df1 = module.files.read_file(file1)
 	df2 = module.files.read_file(file2)
@@ -229,16 +1261,233 @@ def data_comparison(col, file1, file2, preserve_order_by, column_sort_strategy,
 	print(f"保留行顺序: {preserve_order_by}")
 
 	# 合并数据框并按列交替排列
-	merged_df, column_pairs = merge_and_reorder(df1, df2, col, preserve_order_by, column_sort_strategy)
+	diff_masks = None
+	if workers and workers > 1:
+		merged_df, column_pairs, diff_masks = merge_and_reorder_parallel(
+			df1, df2, col, preserve_order_by, column_sort_strategy, workers, column_rules)
+	else:
+		merged_df, column_pairs = merge_and_reorder(df1, df2, col, preserve_order_by, column_sort_strategy)
+
+	if not summary_only:
+		# 保存到 Excel
+		save_to_excel(merged_df, output_path)
+
+		# 所有策略均支持自动匹配同名列并成对高亮，高亮与统计共用同一份差异掩码
+		if column_pairs:
+			if diff_masks is None:
+				diff_masks = compute_difference_masks(merged_df, column_pairs, column_rules)
+			for (col1, col2), count in summarize_differences(diff_masks).items():
+				print(f"列 {col1} / {col2}: {count} 行不同")
+			highlight_differences(output_path, column_pairs, diff_masks)
+		else:
+			print("未找到可高亮的成对列。")
+
+	if summary_path:
+		summary = DifferenceSummary(col, column_rules=column_rules)
+		summary.update_keys(*_key_changes(df1, df2, col))
+		_summarize_merged(summary, merged_df, column_pairs, column_rules, diff_masks,
+			matched=_matched_rows(merged_df, col, df1, df2))
+		summary.save(summary_path)
+
+
+def merge_versions(dfs, comparison_column, labels=None, baseline=None, column_rules=None):
+	"""把同一张表的多个版本按比较列对齐，各版本的同名列并排排列（列_v1, 列_v2, …, 列_vN）
+	参数:
+	  dfs: 各版本的 DataFrame 列表（按版本先后排列）
+	  labels: 各版本的标签，默认 ['v1', 'v2', ...]，用作列名后缀
+	  baseline: None 表示每个版本与上一个版本比较；指定版本标签或下标时，所有版本都与该版本比较
+	  column_rules: 按列的比较规则，同 compute_difference_masks
+	返回:
+	  merged_df, column_pairs, diff_masks
+	  column_pairs 中每对为 (参照版本列, 当前版本列)，diff_masks 为对应的差异掩码
+	说明:
+	  所有版本共用一个键索引（按各键首次出现的顺序），每个版本只做一次按键取行，
+	  耗时随版本数线性增长；同一版本中重复的键按出现次序对齐（各版本的第 k 个重复行互相对齐），
+	  不丢弃任何行；比较列为空值的行视为同一个键
+	"""
+	if labels is None:
+		labels = [f"v{i + 1}" for i in range(len(dfs))]
+	if len(labels) != len(dfs):
+		raise ValueError("labels 数量必须与版本数量一致")
+	if isinstance(baseline, str):
+		if baseline not in labels:
+			raise ValueError(f"基准版本 '{baseline}' 不在 labels 中: {labels}")
+		baseline = labels.index(baseline)
+	if baseline is not None and not 0 <= baseline < len(dfs):
+		raise ValueError(f"基准版本下标 {baseline} 超出范围 0..{len(dfs) - 1}")
+
+	# 所有版本的键统一编码（空值也编为一个键），再加上键在本版本中的出现次序
+	codes, key_values = pd.factorize(
+		pd.concat([df[comparison_column] for df in dfs], ignore_index=True), use_na_sentinel=False)
+	bounds = np.cumsum([0] + [len(df) for df in dfs])
+	occurrences = [
+		pd.Series(codes[start:end]).groupby(codes[start:end]).cumcount().to_numpy()
+		for start, end in zip(bounds[:-1], bounds[1:])
+	]
+	stride = max((int(occurrence.max()) + 1 for occurrence in occurrences if len(occurrence)), default=1)
+	combined = codes.astype(np.int64) * stride + np.concatenate(occurrences + [np.empty(0, dtype=np.int64)])
+	for label, occurrence in zip(labels, occurrences):
+		duplicated = int(np.count_nonzero(occurrence))
+		if duplicated:
+			print(f"版本 {label} 中有 {duplicated} 行重复的比较列值，按出现次序与其他版本对齐")
+
+	# 共用的行索引（键, 出现次序），按首次出现的顺序；每个版本得到一组取行位置，缺失处为 -1
+	aligned_keys = pd.Index(pd.unique(combined))
+	positions = []
+	for start, end in zip(bounds[:-1], bounds[1:]):
+		version_positions = np.full(len(aligned_keys), -1, dtype=np.intp)
+		version_positions[aligned_keys.get_indexer(combined[start:end])] = np.arange(end - start)
+		positions.append(version_positions)
+	keys = pd.Series(key_values).take(aligned_keys.to_numpy() // stride).reset_index(drop=True)
+
+	# 各版本的非比较列并集，按首次出现的顺序
+	base_columns = []
+	for df in dfs:
+		for col in df.columns:
+			if col != comparison_column and col not in base_columns:
+				base_columns.append(col)
+
+	data = {comparison_column: keys}
+	for col in base_columns:
+		for label, df, version_positions in zip(labels, dfs, positions):
+			if col in df.columns:
+				data[f"{col}_{label}"] = _take_rows(df[col], version_positions)
+			else:
+				data[f"{col}_{label}"] = pd.Series(np.nan, index=keys.index)
+	for label, df, version_positions in zip(labels, dfs, positions):
+		data[f"_{label}_original_index"] = _take_rows(pd.Series(np.arange(len(df))), version_positions)
+	merged_df = pd.DataFrame(data)
 
-	# 保存到 Excel
+	# 每个版本与上一版本或基准版本比较
+	column_pairs = []
+	diff_masks = {}
+	for col in base_columns:
+		rule = _resolve_rule(column_rules, col)
+		for i in range(len(labels)):
+			reference = i - 1 if baseline is None else baseline
+			if reference < 0 or reference == i:
+				continue
+			pair = (f"{col}_{labels[reference]}", f"{col}_{labels[i]}")
+			column_pairs.append(pair)
+			diff_masks[pair] = _column_difference(merged_df[pair[0]], merged_df[pair[1]], rule)
+
+	return merged_df, column_pairs, diff_masks
+
+
+def data_comparison_versions(col, files, output_path, labels=None, baseline=None, column_rules=None):
+	"""一次对比同一张表的多个版本文件，输出并排对齐的结果并高亮变化的单元格
+	参数:
+	  col: 比较列名
+	  files: 各版本文件路径列表（按版本先后排列），每个文件只读取一次
+	  output_path: 输出Excel路径
+	  labels, baseline, column_rules: 同 merge_versions
+	"""
+	dfs = []
+	for file_path in files:
+		df = module.files.read_file(file_path)
+		if df is None:
+			print("文件读取失败，程序终止。")
+			return
+		if col not in df.columns:
+			print(f"比较列 '{col}' 在文件 {file_path} 中不存在，程序终止。")
+			return
+		dfs.append(df)
+
+	merged_df, column_pairs, diff_masks = merge_versions(dfs, col, labels, baseline, column_rules)
 	save_to_excel(merged_df, output_path)
 
-	# 所有策略均支持自动匹配同名列并成对高亮
+	for (col1, col2), count in summarize_differences(diff_masks).items():
+		print(f"列 {col2} 相对 {col1}: {count} 行不同")
 	if column_pairs:
-		highlight_differences(output_path, column_pairs)
-	else:
-		print("未找到可高亮的成对列。")
+		highlight_differences(output_path, column_pairs, diff_masks, mark_both=False)
+
+
+def _compare_sheet_pair(col, df1, df2, preserve_order_by, column_sort_strategy, column_rules):
+	"""对比一对工作表（在工作进程中执行）"""
+	merged_df, column_pairs = merge_and_reorder(df1, df2, col, preserve_order_by, column_sort_strategy)
+	diff_masks = compute_difference_masks(merged_df, column_pairs, column_rules)
+	return merged_df, column_pairs, diff_masks
+
+
+def workbook_comparison(col, file1, file2, preserve_order_by, column_sort_strategy, output_path,
+		column_rules=None, max_workers=None):
+	"""按工作表名称匹配两个工作簿，并行对比每对工作表，输出到一个工作簿
+	每对工作表输出为同名工作表并高亮差异，另附一个汇总工作表；每个工作簿只解析一次
+	参数:
+	  col: 比较列名
+	  file1, file2: 工作簿路径
+	  preserve_order_by, column_sort_strategy, column_rules: 同 data_comparison
+	  output_path: 输出Excel路径
+	  max_workers: 并行进程数，None 表示使用 CPU 核数
+	"""
+	sheets1 = module.files.read_workbook(file1)
+	sheets2 = module.files.read_workbook(file2)
+
+	if sheets1 is None or sheets2 is None:
+		print("工作簿读取失败，程序终止。")
+		return
+
+	summary_rows = []
+	pair_names = []
+	for name, df1 in sheets1.items():
+		if name not in sheets2:
+			summary_rows.append({'工作表': name, '状态': '仅存在于文件1'})
+		elif col not in df1.columns or col not in sheets2[name].columns:
+			summary_rows.append({'工作表': name, '状态': f"缺少比较列 '{col}'，已跳过"})
+		else:
+			pair_names.append(name)
+	for name in sheets2:
+		if name not in sheets1:
+			summary_rows.append({'工作表': name, '状态': '仅存在于文件2'})
+
+	print(f"匹配到 {len(pair_names)} 对同名工作表: {pair_names}")
+
+	# 每对工作表在独立进程中合并、计算差异
+	results = {}
+	if pair_names:
+		with ProcessPoolExecutor(max_workers=max_workers, mp_context=_parallel_context()) as executor:
+			futures = {
+				name: executor.submit(_compare_sheet_pair, col, sheets1[name], sheets2[name],
+					preserve_order_by, column_sort_strategy, column_rules)
+				for name in pair_names
+			}
+			for name in pair_names:
+				try:
+					results[name] = futures[name].result()
+				except Exception as e:
+					print(f"对比工作表 {name} 时出错: {e}")
+					summary_rows.append({'工作表': name, '状态': f"对比出错: {e}"})
+
+	summary_sheet = '汇总'
+	while summary_sheet in results:
+		summary_sheet = f"_{summary_sheet}"
+
+	for name in pair_names:
+		if name not in results:
+			continue
+		merged_df, column_pairs, diff_masks = results[name]
+		counts = summarize_differences(diff_masks)
+		summary_rows.append({
+			'工作表': name,
+			'状态': '已对比',
+			'行数': len(merged_df),
+			'存在差异的行数': int(np.count_nonzero(np.logical_or.reduce(list(diff_masks.values())))) if diff_masks else 0,
+			'差异明细': '; '.join(f"{col2}: {count}" for (col1, col2), count in counts.items() if count),
+		})
+
+	try:
+		with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+			pd.DataFrame(summary_rows).to_excel(writer, sheet_name=summary_sheet, index=False)
+			highlighted_cells = 0
+			for name in pair_names:
+				if name not in results:
+					continue
+				merged_df, column_pairs, diff_masks = results[name]
+				merged_df.to_excel(writer, sheet_name=name, index=False)
+				highlighted_cells += _highlight_sheet(writer.sheets[name], column_pairs, diff_masks)
+		print(f"工作簿对比结果已保存到: {output_path}，共高亮了 {highlighted_cells} 个单元格")
+	except Exception as e:
+		print(f"保存工作簿对比结果时出错: {e}")
 
 
 if __name__ == "__main__":
@@ -266,6 +1515,9 @@ if __name__ == "__main__":
 	# print("\n=== 分组排列策略 ===")
 	# data_comparison(comparison_column, file1, file2, preserve_order_by='df1', column_sort_strategy='grouped', output_path='./data/out_grouped.xlsx')
 	
+	# print("\n=== 多工作表工作簿对比 ===")
+	# workbook_comparison(comparison_column, file1, file2, preserve_order_by=None, column_sort_strategy='alternating', output_path='./data/out_workbook.xlsx')
+	
 	# print("\n=== 字母顺序排列策略 ===")
 	# data_comparison(comparison_column, file1, file2, preserve_order_by='df1', column_sort_strategy='alphabetical', output_path='./data/out_alphabetical.xlsx')
 
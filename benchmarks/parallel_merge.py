@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+merge_and_reorder_parallel 的扩展性基准
+生成两张随机表，分别计时串行的 merge_and_reorder + compute_difference_masks
+和不同并行数下的 merge_and_reorder_parallel，输出耗时和相对串行的加速比
+用法:
+  python benchmarks/parallel_merge.py --rows 1000000 --workers 1 2 4 8
+  python benchmarks/parallel_merge.py --key-type str   # 文本键（哈希更慢，更依赖并行）
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TableComparison import compute_difference_masks, merge_and_reorder, merge_and_reorder_parallel  # noqa: E402
+
+
+def make_table(rows, offset, key_type, seed):
+	"""生成一张测试表：比较列 K 为打乱的连续整数（两表之间错开 offset），其余为数值、文本和日期列"""
+	rng = np.random.default_rng(seed)
+	keys = rng.permutation(rows) + offset
+	return pd.DataFrame({
+		'K': keys.astype(str) if key_type == 'str' else keys,
+		'int': rng.integers(0, 3, rows),
+		'float': rng.random(rows).round(2),
+		'text': pd.Series(np.array(['a', 'b', 'c'])[rng.integers(0, 3, rows)], dtype='str'),
+		'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 3, rows), unit='D'),
+		'flag': rng.random(rows) > 0.5,
+	})
+
+
+def best_of(repeat, run):
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		run()
+		timings.append(time.perf_counter() - start)
+	return min(timings)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='merge_and_reorder_parallel 扩展性基准')
+	parser.add_argument('--rows', type=int, default=1000000, help='每张表的行数')
+	parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='要测试的并行数')
+	parser.add_argument('--key-type', choices=['int', 'str'], default='int', help='比较列类型')
+	parser.add_argument('--preserve-order-by', choices=['df1', 'df2'], default=None)
+	parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最短耗时')
+	args = parser.parse_args()
+
+	df1 = make_table(args.rows, 0, args.key_type, 0)
+	df2 = make_table(args.rows, args.rows // 10, args.key_type, 1)
+	print(f"CPU 核数: {os.cpu_count()}，每表 {args.rows} 行，比较列类型 {args.key_type}")
+
+	def serial():
+		merged_df, column_pairs = merge_and_reorder(df1, df2, 'K', args.preserve_order_by)
+		compute_difference_masks(merged_df, column_pairs)
+
+	baseline = best_of(args.repeat, serial)
+	print(f"{'串行':>8}  {baseline:8.2f}s")
+	for workers in args.workers:
+		elapsed = best_of(args.repeat, lambda: merge_and_reorder_parallel(
+			df1, df2, 'K', args.preserve_order_by, workers=workers, min_rows=0))
+		print(f"{workers:>6} 核  {elapsed:8.2f}s  加速比 {baseline / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件对比服务 - 常驻进程
+把常用的基准表解析后常驻内存（按比较列建立键索引），通过本地 HTTP 接口接收对比任务，
+每个任务只需读取新文件，在基准表的键索引中查找新文件的键，再用 merge_and_reorder_indexed 组装结果
+
+服务只接受本机请求：默认只监听回环地址，校验 Host 请求头，POST 请求体必须是 application/json，
+并且每个请求都要在 X-Comparison-Token 请求头中携带启动时写入本地令牌文件的随机令牌，
+防止网页通过跨站请求或 DNS 重绑定读取任意路径、把结果写到任意位置
+
+用法:
+  python compare_service.py serve --port 8765 --memory-budget-mb 4096
+  python compare_service.py load 点位表 ./baseline/points.xlsx --column name
+  python compare_service.py compare 点位表 ./today/points.csv --output ./data/points_diff.xlsx
+  python compare_service.py metrics
+"""
+
+import argparse
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import module.files
+from TableComparison import (
+    KeyIndex, compute_difference_masks, highlight_differences, merge_and_reorder_indexed, save_to_excel,
+    summarize_differences,
+)
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+TOKEN_HEADER = 'X-Comparison-Token'
+# 令牌文件目录，只有当前用户可读
+TOKEN_DIR = os.environ.get(
+    'DOC_PROCESSING_SERVICE_DIR',
+    os.path.join(os.path.expanduser('~'), '.document-processing'),
+)
+_LOOPBACK_NAMES = ('localhost', '127.0.0.1', '::1')
+
+
+def token_file_path(port=DEFAULT_PORT):
+    """服务令牌文件路径，每个端口一个"""
+    return os.path.join(TOKEN_DIR, f"compare_service_{port}.token")
+
+
+def _write_token(path):
+    """生成随机令牌并写入只有当前用户可读的文件"""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+
+def _read_token(path):
+    """读取令牌文件，文件不存在时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _is_loopback(host):
+    """监听地址是否为本机回环地址"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _json_default(value):
+    """把 NumPy/pandas 标量转换为可序列化的值"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return str(value)
+
+
+class Baseline:
+    """常驻内存的基准表"""
+
+    def __init__(self, name, path, comparison_column, df):
+        self.name = name
+        self.path = path
+        self.comparison_column = comparison_column
+        self.df = df
+        # 比较列的键索引（去重键的哈希表和各键的行位置）在加载时建立一次，
+        # 各任务只在其中查找新文件的键，不再对基准表做 pd.merge
+        self.key_index = KeyIndex(df[comparison_column])
+        self.nbytes = int(df.memory_usage(index=True, deep=True).sum()) + self.key_index.nbytes
+        self.loaded_at = time.time()
+
+    def key_changes(self, keys):
+        """返回 (新文件中新增的键数, 基准表中被删除的键数)，按去重后的键计数"""
+        return self.key_index.key_changes(keys)
+
+    def job_working_bytes(self, df):
+        """估算与 df 对比一次需要的工作内存：新文件、合并结果（约为两表之和）和差异掩码"""
+        new_bytes = int(df.memory_usage(index=True, deep=True).sum())
+        mask_bytes = (len(self.df) + len(df)) * len(df.columns)
+        return new_bytes + self.nbytes + new_bytes + mask_bytes
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'path': self.path,
+            'comparison_column': self.comparison_column,
+            'rows': len(self.df),
+            'memory_mb': round(self.nbytes / 1024 / 1024, 2),
+            'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at)),
+        }
+
+
+class BaselineStore:
+    """按内存预算管理基准表和进行中任务的工作内存，超出预算时淘汰最久未使用的基准表"""
+
+    def __init__(self, memory_budget_bytes):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._baselines = OrderedDict()
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def load(self, name, path, comparison_column):
+        """读取并常驻一个基准表，同名基准表会被替换"""
+        df = module.files.read_file(path)
+        if df is None:
+            raise ValueError(f"基准文件读取失败: {path}")
+        if comparison_column not in df.columns:
+            raise ValueError(f"比较列 '{comparison_column}' 在基准文件中不存在")
+        baseline = Baseline(name, path, comparison_column, df)
+        with self._lock:
+            self._baselines.pop(name, None)
+            self._baselines[name] = baseline
+            self._evict(keep=name)
+        return baseline
+
+    def get(self, name):
+        with self._lock:
+            baseline = self._baselines.get(name)
+            if baseline is not None:
+                self._baselines.move_to_end(name)
+            return baseline
+
+    def drop(self, name):
+        with self._lock:
+            return self._baselines.pop(name, None) is not None
+
+    def reserve(self, nbytes, keep):
+        """为进行中的任务预留工作内存，必要时淘汰其他基准表（任务使用的基准表 keep 保留）"""
+        with self._lock:
+            self._reserved += nbytes
+            self._evict(keep)
+
+    def release(self, nbytes):
+        """任务结束后归还预留的工作内存"""
+        with self._lock:
+            self._reserved -= nbytes
+
+    def describe(self):
+        with self._lock:
+            return {
+                'memory_budget_mb': round(self.memory_budget_bytes / 1024 / 1024, 2),
+                'memory_used_mb': round(sum(b.nbytes for b in self._baselines.values()) / 1024 / 1024, 2),
+                'memory_reserved_by_jobs_mb': round(self._reserved / 1024 / 1024, 2),
+                'baselines': [b.describe() for b in self._baselines.values()],
+            }
+
+    def _evict(self, keep):
+        """淘汰最久未使用的基准表，直到基准表与任务预留内存之和不超过预算（keep 指定的基准表保留）"""
+        total = sum(b.nbytes for b in self._baselines.values()) + self._reserved
+        for name in list(self._baselines):
+            if total <= self.memory_budget_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._baselines.pop(name).nbytes
+            print(f"内存超出预算，已淘汰基准表: {name}")
+        if total > self.memory_budget_bytes:
+            print(f"警告: 基准表 {keep} 与进行中任务的工作内存合计 {total / 1024 / 1024:.0f} MB，超出内存预算")
+
+
+class JobMetrics:
+    """记录最近任务的分阶段耗时，并汇总延迟统计"""
+
+    def __init__(self, history=500):
+        self._jobs = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def record(self, job):
+        with self._lock:
+            self._jobs.append(job)
+            if job.get('error'):
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def describe(self):
+        with self._lock:
+            jobs = list(self._jobs)
+            completed, failed = self.completed, self.failed
+        latencies = np.array([job['timings']['total'] for job in jobs if not job.get('error')])
+        summary = {'completed': completed, 'failed': failed, 'recent_jobs': jobs[-20:]}
+        if len(latencies):
+            summary['latency_seconds'] = {
+                'mean': round(float(latencies.mean()), 4),
+                'p50': round(float(np.percentile(latencies, 50)), 4),
+                'p95': round(float(np.percentile(latencies, 95)), 4),
+                'max': round(float(latencies.max()), 4),
+            }
+        return summary
+
+
+class ComparisonService:
+    """对比服务核心：基准表存储、并发任务控制和指标"""
+
+    def __init__(self, memory_budget_bytes, max_concurrent_jobs=4):
+        self.baselines = BaselineStore(memory_budget_bytes)
+        self.metrics = JobMetrics()
+        self._job_slots = threading.Semaphore(max_concurrent_jobs)
+        self._job_ids = itertools.count(1)
+        self._job_id_lock = threading.Lock()
+
+    def run_job(self, request):
+        """执行一个对比任务
+        request 字段:
+          baseline: 基准表名称（必填）
+          file: 新文件路径（必填）
+          output_path: 输出Excel路径，省略时只返回统计结果
+          preserve_order_by, column_sort_strategy, column_rules: 同 data_comparison
+        """
+        with self._job_id_lock:
+            job_id = next(self._job_ids)
+        job = {'job_id': job_id, 'baseline': request.get('baseline'), 'file': request.get('file'), 'timings': {}}
+        timings = job['timings']
+        started = time.perf_counter()
+        try:
+            for field in ('baseline', 'file'):
+                if not request.get(field):
+                    raise ValueError(f"缺少参数: {field}")
+            baseline = self.baselines.get(request['baseline'])
+            if baseline is None:
+                raise ValueError(f"基准表不存在或已被淘汰: {request['baseline']}")
+
+            with self._job_slots:
+                timings['queued'] = round(time.perf_counter() - started, 4)
+
+                stage = time.perf_counter()
+                df = module.files.read_file(request['file'])
+                if df is None:
+                    raise ValueError(f"文件读取失败: {request['file']}")
+                col = baseline.comparison_column
+                if col not in df.columns:
+                    raise ValueError(f"比较列 '{col}' 在文件中不存在")
+                timings['read'] = round(time.perf_counter() - stage, 4)
+
+                # 任务的工作内存计入预算，预算不足时先淘汰其他基准表
+                working_bytes = baseline.job_working_bytes(df)
+                self.baselines.reserve(working_bytes, keep=baseline.name)
+                try:
+                    stage = time.perf_counter()
+                    merged_df, column_pairs = merge_and_reorder_indexed(
+                        baseline.df, baseline.key_index, df, col,
+                        request.get('preserve_order_by'),
+                        request.get('column_sort_strategy', 'alternating'),
+                    )
+                    timings['merge'] = round(time.perf_counter() - stage, 4)
+
+                    stage = time.perf_counter()
+                    diff_masks = compute_difference_masks(merged_df, column_pairs, request.get('column_rules'))
+                    job['rows'] = len(merged_df)
+                    job['added_keys'], job['removed_keys'] = baseline.key_changes(df[col])
+                    job['differences'] = {
+                        f"{col1} / {col2}": count for (col1, col2), count in summarize_differences(diff_masks).items()
+                    }
+                    timings['diff'] = round(time.perf_counter() - stage, 4)
+
+                    output_path = request.get('output_path')
+                    if output_path:
+                        stage = time.perf_counter()
+                        save_to_excel(merged_df, output_path)
+                        if column_pairs:
+                            highlight_differences(output_path, column_pairs, diff_masks)
+                        job['output_path'] = output_path
+                        timings['write'] = round(time.perf_counter() - stage, 4)
+                finally:
+                    self.baselines.release(working_bytes)
+        except Exception as e:
+            job['error'] = str(e)
+        timings['total'] = round(time.perf_counter() - started, 4)
+        self.metrics.record(job)
+        return job
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """本地 HTTP 接口
+      GET    /health             健康检查
+      GET    /baselines          列出常驻的基准表
+      POST   /baselines          加载基准表 {name, path, comparison_column}
+      DELETE /baselines/<name>   移除基准表
+      POST   /jobs               执行对比任务，见 ComparisonService.run_job
+      GET    /metrics            任务延迟指标
+    """
+
+    service = None
+    token = None
+    # 允许的 Host 请求头（不含端口）；为 None 时不校验（--allow-remote）
+    allowed_hosts = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def _request_host(self):
+        """Host 请求头中的主机名（去掉端口和 IPv6 方括号）"""
+        host = (self.headers.get('Host') or '').strip().lower()
+        if host.startswith('['):
+            return host[1:host.find(']')] if ']' in host else host
+        return host.rsplit(':', 1)[0] if host.count(':') == 1 else host
+
+    def _authorize(self, require_json=False):
+        """校验 Host、令牌和 Content-Type，不通过时直接返回错误响应并返回 False"""
+        if self.allowed_hosts is not None and self._request_host() not in self.allowed_hosts:
+            self._send(403, {'error': f"不允许的 Host: {self.headers.get('Host')}"})
+            return False
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, '').encode('utf-8'), self.token.encode('utf-8')):
+            self._send(401, {'error': f"缺少或错误的 {TOKEN_HEADER} 请求头"})
+            return False
+        if require_json:
+            content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+            if content_type != 'application/json':
+                self._send(415, {'error': "请求体必须为 application/json"})
+                return False
+        return True
+
+    def do_GET(self):
+        if not self._authorize():
+            return
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/baselines':
+            self._send(200, self.service.baselines.describe())
+        elif self.path == '/metrics':
+            self._send(200, self.service.metrics.describe())
+        else:
+            self._send(404, {'error': f"未知路径: {self.path}"})
+
+    def do_POST(self):
+        if not self._authorize(require_json=True):
+            return
+        try:
+            request = self._read_json()
+        except ValueError as e:
+            self._send(400, {'error': f"请求体不是合法的 JSON: {e}"})
+            return
+
+        if self.path == '/baselines':
+            try:
+                baseline = self.service.baselines.load(request['name'], request['path'], request['comparison_column'])
+                self._send(200, baseline.describe())
+            except KeyError as e:
+                self._send(400, {'error': f"缺少参数: {e}"})
+            except Exception as e:
+                self._send(400, {'error': str(e)})
+        elif self.path == '/jobs':
+            job = self.service.run_job(request)
+            self._send(200 if not job.get('error') else 400, job)
+        else:
+            self._send(404, {'error': f"未知路径: {self.path}"})
+
+    def do_DELETE(self):
+        if not self._authorize():
+            return
+        prefix = '/baselines/'
+        if self.path.startswith(prefix):
+            name = urllib.request.unquote(self.path[len(prefix):])
+            if self.service.baselines.drop(name):
+                self._send(200, {'dropped': name})
+            else:
+                self._send(404, {'error': f"基准表不存在: {name}"})
+        else:
+            self._send(404, {'error': f"未知路径: {self.path}"})
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, memory_budget_mb=4096, max_concurrent_jobs=4, token_file=None,
+                  allow_remote=False):
+    """创建对比服务（尚未开始处理请求），返回 ThreadingHTTPServer
+    调用方负责 serve_forever()，以及结束时的 shutdown() / server_close()；令牌文件路径保存在 server.token_file
+    参数同 serve；port 为 0 时由系统分配端口（见 server.server_address）
+    """
+    if not _is_loopback(host):
+        if not allow_remote:
+            raise ValueError(f"监听地址 {host} 不是本机回环地址；服务可以读写本机任意路径，"
+                             f"如确需远程访问请加 --allow-remote")
+        print(f"警告: 服务监听在非回环地址 {host}，任何持有令牌的主机都可以读写本机文件")
+    allowed_hosts = None if not _is_loopback(host) else set(_LOOPBACK_NAMES) | {host.lower()}
+    service = ComparisonService(memory_budget_mb * 1024 * 1024, max_concurrent_jobs)
+    handler = type('RequestHandler', (_RequestHandler,), {'service': service, 'allowed_hosts': allowed_hosts})
+    server = ThreadingHTTPServer((host, port), handler)
+    # 端口绑定成功后再写令牌，避免覆盖同端口上已在运行的服务的令牌
+    server.token_file = token_file or token_file_path(server.server_address[1])
+    handler.token = _write_token(server.token_file)
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, memory_budget_mb=4096, max_concurrent_jobs=4, token_file=None,
+          allow_remote=False):
+    """启动对比服务
+    参数:
+      token_file: 令牌文件路径，默认 token_file_path(port)；每次启动生成新令牌
+      allow_remote: 允许监听非回环地址（此时不校验 Host，仍要求令牌）；默认拒绝
+    """
+    server = create_server(host, port, memory_budget_mb, max_concurrent_jobs, token_file, allow_remote)
+    print(f"对比服务已启动: http://{host}:{server.server_address[1]}"
+          f"（内存预算 {memory_budget_mb} MB，最多 {max_concurrent_jobs} 个并发任务）")
+    print(f"访问令牌已写入: {server.token_file}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("对比服务已停止")
+    finally:
+        server.server_close()
+        try:
+            os.remove(server.token_file)
+        except OSError:
+            pass
+
+
+class ComparisonClient:
+    """对比服务的客户端"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=3600, token=None, token_file=None):
+        """token 省略时从服务写入的令牌文件读取（默认 token_file_path(port)）"""
+        self.base_url = f"http://{'[' + host + ']' if ':' in host else host}:{port}"
+        self.timeout = timeout
+        self.token = token or _read_token(token_file or token_file_path(port))
+        if not self.token:
+            raise ValueError(f"找不到服务令牌文件 {token_file or token_file_path(port)}，请确认服务已启动")
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json', TOKEN_HEADER: self.token})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            # 服务端的业务错误同样以 JSON 返回
+            return json.loads(e.read().decode('utf-8'))
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def load_baseline(self, name, path, comparison_column):
+        return self._request('POST', '/baselines', {'name': name, 'path': path, 'comparison_column': comparison_column})
+
+    def drop_baseline(self, name):
+        return self._request('DELETE', f"/baselines/{urllib.request.quote(name)}")
+
+    def baselines(self):
+        return self._request('GET', '/baselines')
+
+    def compare(self, baseline, file, output_path=None, preserve_order_by=None, column_sort_strategy='alternating',
+                column_rules=None):
+        return self._request('POST', '/jobs', {
+            'baseline': baseline,
+            'file': file,
+            'output_path': output_path,
+            'preserve_order_by': preserve_order_by,
+            'column_sort_strategy': column_sort_strategy,
+            'column_rules': column_rules,
+        })
+
+    def metrics(self):
+        return self._request('GET', '/metrics')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文件对比服务")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--token-file', default=None, help="令牌文件路径，默认按端口放在 ~/.document-processing 下")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="启动服务")
+    serve_parser.add_argument('--memory-budget-mb', type=int, default=4096)
+    serve_parser.add_argument('--max-jobs', type=int, default=4)
+    serve_parser.add_argument('--allow-remote', action='store_true', help="允许监听非回环地址（不推荐）")
+
+    load_parser = commands.add_parser('load', help="加载基准表")
+    load_parser.add_argument('name')
+    load_parser.add_argument('path')
+    load_parser.add_argument('--column', required=True, help="比较列名")
+
+    drop_parser = commands.add_parser('drop', help="移除基准表")
+    drop_parser.add_argument('name')
+
+    compare_parser = commands.add_parser('compare', help="与基准表对比")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('file')
+    compare_parser.add_argument('--output', default=None)
+    compare_parser.add_argument('--preserve-order-by', choices=['df1', 'df2'], default=None)
+    compare_parser.add_argument('--column-sort-strategy', choices=['alternating', 'grouped', 'alphabetical'],
+                                default='alternating')
+
+    commands.add_parser('baselines', help="列出基准表")
+    commands.add_parser('metrics', help="查看任务指标")
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.host, args.port, args.memory_budget_mb, args.max_jobs, args.token_file, args.allow_remote)
+        return
+
+    client = ComparisonClient(args.host, args.port, token_file=args.token_file)
+    if args.command == 'load':
+        result = client.load_baseline(args.name, args.path, args.column)
+    elif args.command == 'drop':
+        result = client.drop_baseline(args.name)
+    elif args.command == 'compare':
+        result = client.compare(args.baseline, args.file, args.output, args.preserve_order_by,
+                                args.column_sort_strategy)
+    elif args.command == 'baselines':
+        result = client.baselines()
+    else:
+        result = client.metrics()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
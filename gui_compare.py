@@ -14,7 +14,7 @@ from datetime import datetime
 
 # 导入我们的文件处理模块
 import module.files
-from TableComparison import merge_and_reorder, highlight_differences, save_to_excel
+from TableComparison import merge_and_reorder, highlight_differences, save_to_excel, compute_difference_masks, summarize_differences
 
 
 class FileCompareGUI:
@@ -145,9 +145,10 @@ class FileCompareGUI:
     def browse_file1(self):
         filename = filedialog.askopenfilename(
             title="选择第一个文件",
-            filetypes=[("所有支持的文件", "*.csv;*.xlsx;*.xls"), 
+            filetypes=[("所有支持的文件", "*.csv;*.xlsx;*.xls;*.gz;*.bz2;*.xz;*.zst;*.zip"), 
                       ("CSV文件", "*.csv"), 
-                      ("Excel文件", "*.xlsx;*.xls")]
+                      ("Excel文件", "*.xlsx;*.xls"),
+                      ("压缩文件", "*.gz;*.bz2;*.xz;*.zst;*.zip")]
         )
         if filename:
             self.file1_path.set(filename)
@@ -156,9 +157,10 @@ class FileCompareGUI:
     def browse_file2(self):
         filename = filedialog.askopenfilename(
             title="选择第二个文件",
-            filetypes=[("所有支持的文件", "*.csv;*.xlsx;*.xls"), 
+            filetypes=[("所有支持的文件", "*.csv;*.xlsx;*.xls;*.gz;*.bz2;*.xz;*.zst;*.zip"), 
                       ("CSV文件", "*.csv"), 
-                      ("Excel文件", "*.xlsx;*.xls")]
+                      ("Excel文件", "*.xlsx;*.xls"),
+                      ("压缩文件", "*.gz;*.bz2;*.xz;*.zst;*.zip")]
         )
         if filename:
             self.file2_path.set(filename)
@@ -306,8 +308,11 @@ class FileCompareGUI:
             # 执行高亮
             if column_pairs:
                 self.log_message("正在执行高亮处理...")
-                highlight_differences(output_path, column_pairs)  # 使用转换后的绝对路径
+                diff_masks = compute_difference_masks(merged_df, column_pairs)
+                highlight_differences(output_path, column_pairs, diff_masks)  # 使用转换后的绝对路径
                 self.log_message(f"找到 {len(column_pairs)} 对可对比的列")
+                for (col1, col2), count in summarize_differences(diff_masks).items():
+                    self.log_message(f"列 {col1} / {col2}: {count} 行不同")
             else:
                 self.log_message("未找到可高亮的成对列")
             
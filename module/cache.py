@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析结果缓存模块
+把 read_file / read_workbook 解析出的 DataFrame 以 Arrow IPC（Feather v2）格式缓存到磁盘，
+再次读取同一文件时以内存映射方式加载，省去 Excel/CSV 的重复解析
+缓存键由文件绝对路径、大小、修改时间和读取选项组成，源文件变化后自动失效
+"""
+import base64
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # 未安装 pyarrow 时缓存自动停用
+    pa = None
+
+# Arrow 转换 object 列时的失败类型；超出 int64 范围的整数抛出 OverflowError
+_UNCONVERTIBLE = (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) if pa is not None else ()
+
+# 缓存目录、容量上限（字节）和开关，均可通过环境变量设置
+CACHE_DIR = os.environ.get(
+    'DOC_PROCESSING_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'document-processing'),
+)
+CACHE_MAX_BYTES = int(os.environ.get('DOC_PROCESSING_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+CACHE_ENABLED = os.environ.get('DOC_PROCESSING_CACHE', '1') != '0'
+
+_DATA_SUFFIX = '.arrow'
+_MANIFEST_SUFFIX = '.json'
+# Arrow 无法表示的混合类型 object 列单独以 pickle 保存在同名旁路文件中
+_MIXED_SUFFIX = '.mixed.pkl'
+# 原始列标签（可能是整数、日期等非字符串）保存在 Arrow schema 元数据中
+_LABELS_KEY = b'document_processing.labels'
+
+
+def is_enabled():
+    """缓存是否可用（已开启且安装了 pyarrow）"""
+    return CACHE_ENABLED and pa is not None
+
+
+def set_enabled(enabled):
+    """运行时开启或关闭缓存"""
+    global CACHE_ENABLED
+    CACHE_ENABLED = bool(enabled)
+
+
+def _cache_key(file_path, options):
+    """由文件路径、大小、修改时间和读取选项生成缓存键"""
+    stat = os.stat(file_path)
+    payload = json.dumps(
+        [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, options],
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _touch(path):
+    """更新访问时间，作为 LRU 淘汰依据"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _mixed_path(path):
+    """数据文件对应的混合类型列旁路文件"""
+    return path[:-len(_DATA_SUFFIX)] + _MIXED_SUFFIX
+
+
+def _write_atomic(path, write):
+    """先写入缓存目录中的唯一临时文件再替换目标文件，多线程、多进程同时写入互不干扰"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _mixed_columns(frame):
+    """找出 Arrow 无法转换的列（同一 object 列中混有数值和字符串、超出 int64 的整数等）的位置"""
+    positions = []
+    for position in range(frame.shape[1]):
+        column = frame.iloc[:, position]
+        if column.dtype != object:
+            continue
+        try:
+            pa.Array.from_pandas(column)
+        except _UNCONVERTIBLE:
+            positions.append(position)
+    return positions
+
+
+def _load_table(path):
+    """以内存映射方式加载缓存文件；数值列在无空值时零拷贝转换为 DataFrame"""
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    _touch(path)
+    df = table.to_pandas(split_blocks=True)
+    metadata = table.schema.metadata or {}
+    if _LABELS_KEY not in metadata:
+        return df
+    labels = pickle.loads(base64.b64decode(metadata[_LABELS_KEY]))
+    mixed_path = _mixed_path(path)
+    if os.path.exists(mixed_path):
+        df = pd.concat([df, pd.read_pickle(mixed_path)], axis=1)
+        _touch(mixed_path)
+    # 列按位置命名，恢复原始顺序后换回原始列标签
+    df = df[[f"_{position}" for position in range(len(labels))]]
+    df.columns = labels
+    return df
+
+
+def _store_table(path, df):
+    """写入缓存文件（不压缩，保证可以直接内存映射）
+    列按位置重命名后写入，原始列标签记录在 schema 元数据中；
+    混合类型列写入旁路 pickle 文件，读取时原样拼回
+    """
+    frame = df.copy(deep=False)
+    frame.columns = [f"_{position}" for position in range(frame.shape[1])]
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        mixed = []
+    except _UNCONVERTIBLE:
+        mixed = _mixed_columns(frame)
+        table = pa.Table.from_pandas(frame.drop(columns=frame.columns[mixed]), preserve_index=False)
+
+    labels = base64.b64encode(pickle.dumps(df.columns))
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _LABELS_KEY: labels})
+
+    mixed_path = _mixed_path(path)
+    if mixed:
+        _write_atomic(mixed_path, frame.iloc[:, mixed].reset_index(drop=True).to_pickle)
+    elif os.path.exists(mixed_path):
+        os.remove(mixed_path)
+
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    _write_atomic(path, write)
+
+
+def load(file_path, options=None):
+    """读取缓存，未命中或缓存不可用时返回 None"""
+    if not is_enabled():
+        return None
+    try:
+        path = os.path.join(CACHE_DIR, _cache_key(file_path, options) + _DATA_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        return _load_table(path)
+    except Exception as e:
+        print(f"读取缓存失败，将重新解析 {file_path}: {e}")
+        return None
+
+
+def store(file_path, df, options=None):
+    """写入缓存，失败时只打印提示，不影响正常读取"""
+    if not is_enabled() or df is None:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, _cache_key(file_path, options) + _DATA_SUFFIX)
+        _store_table(path, df)
+        evict()
+    except Exception as e:
+        print(f"写入缓存失败 {file_path}: {e}")
+
+
+def load_sheets(file_path, options=None):
+    """读取多工作表缓存，返回 {工作表名: DataFrame}；任一工作表缺失视为未命中"""
+    if not is_enabled():
+        return None
+    try:
+        key = _cache_key(file_path, options)
+        manifest_path = os.path.join(CACHE_DIR, key + _MANIFEST_SUFFIX)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            sheet_names = json.load(f)
+        _touch(manifest_path)
+        sheets = {}
+        for index, name in enumerate(sheet_names):
+            path = os.path.join(CACHE_DIR, f"{key}_{index}{_DATA_SUFFIX}")
+            if not os.path.exists(path):
+                return None
+            sheets[name] = _load_table(path)
+        return sheets
+    except Exception as e:
+        print(f"读取缓存失败，将重新解析 {file_path}: {e}")
+        return None
+
+
+def store_sheets(file_path, sheets, options=None):
+    """写入多工作表缓存：每个工作表一个数据文件，外加一个记录工作表顺序的清单"""
+    if not is_enabled() or sheets is None:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        key = _cache_key(file_path, options)
+        for index, df in enumerate(sheets.values()):
+            _store_table(os.path.join(CACHE_DIR, f"{key}_{index}{_DATA_SUFFIX}"), df)
+
+        def write_manifest(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([str(name) for name in sheets], f, ensure_ascii=False)
+
+        _write_atomic(os.path.join(CACHE_DIR, key + _MANIFEST_SUFFIX), write_manifest)
+        evict()
+    except Exception as e:
+        print(f"写入缓存失败 {file_path}: {e}")
+
+
+def evict(max_bytes=None):
+    """按最近访问时间淘汰缓存文件，直到总大小不超过上限"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith((_DATA_SUFFIX, _MANIFEST_SUFFIX, _MIXED_SUFFIX)):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            # Windows 下仍被内存映射的文件无法删除，跳过
+            continue
+
+
+def clear():
+    """清空缓存目录"""
+    evict(max_bytes=0)
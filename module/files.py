@@ -4,8 +4,24 @@
 文件处理模块程序
 支持CSV、Excel的读取和文档处理功能
 """
-import pandas as pd
+import bz2
+import codecs
+import csv
+import gzip
+import io
+import lzma
 import os
+import queue
+import re
+import threading
+import zipfile
+import numpy as np
+import pandas as pd
+
+try:
+    from module import cache
+except ImportError:  # 直接运行本文件时
+    import cache
 
 def classify_filename(filename,classify_name1,classify_name2):
 
@@ -31,55 +47,393 @@ def classify_filename(filename,classify_name1,classify_name2):
         return classify_name2
     return None
 
-def _read_csv_with_fallback(file_path: str):
+# 压缩格式后缀，如 data.csv.gz、data.csv.zst
+_COMPRESSION_SUFFIXES = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+_SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+def _split_compression(file_path):
+    """解析文件的数据格式和压缩格式，返回 (数据格式后缀, 压缩格式)
+    zip 归档的数据格式由所选成员决定，此处返回 None
+    """
+    root, extension = os.path.splitext(file_path)
+    extension = extension.lower()
+    if extension == '.zip':
+        return None, 'zip'
+    if extension in _COMPRESSION_SUFFIXES:
+        return os.path.splitext(root)[1].lower(), _COMPRESSION_SUFFIXES[extension]
+    return extension, None
+
+def _default_zip_member(file_path):
+    """未指定成员时，选择 zip 归档中第一个 CSV/Excel 文件"""
+    with zipfile.ZipFile(file_path) as archive:
+        for name in archive.namelist():
+            if not name.endswith('/') and os.path.splitext(name)[1].lower() in _SUPPORTED_EXTENSIONS:
+                return name
+    raise ValueError(f"zip 归档中没有 CSV/Excel 文件: {file_path}")
+
+def _open_decompressed(file_path, compression, member=None):
+    """打开解压后的二进制流（不落盘）"""
+    if compression == 'gzip':
+        return gzip.open(file_path, 'rb')
+    if compression == 'bz2':
+        return bz2.open(file_path, 'rb')
+    if compression == 'xz':
+        return lzma.open(file_path, 'rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("读取 .zst 文件需要安装 zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    if compression == 'zip':
+        # 成员流会持有归档文件的引用，归档对象释放后流仍可继续读取
+        return zipfile.ZipFile(file_path).open(member)
+    return open(file_path, 'rb')
+
+class _ReadAheadStream(io.RawIOBase):
+    """在后台线程中预读并解压数据块，通过有界队列交给解析方，使解压与解析并行进行"""
+
+    def __init__(self, source, block_size=1 << 20, max_blocks=8):
+        super().__init__()
+        self._source = source
+        self._block_size = block_size
+        self._queue = queue.Queue(maxsize=max_blocks)
+        self._pending = b''
+        self._eof = False
+        self._error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _put(self, block):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(self):
+        try:
+            while not self._stop.is_set():
+                block = self._source.read(self._block_size)
+                self._put(block)
+                if not block:
+                    return
+        except Exception as e:
+            self._error = e
+            self._put(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._eof:
+                return 0
+            block = self._queue.get()
+            if not block:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._pending = memoryview(block)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+def _stream_opener(file_path, compression, member=None):
+    """返回一个每次调用都重新打开解压流的函数（编码回退时需要从头重读）"""
+    def opener():
+        return io.BufferedReader(_ReadAheadStream(_open_decompressed(file_path, compression, member)))
+    return opener
+
+def _resolve_source(file_path, member=None):
+    """解析输入文件，返回 (数据格式后缀, 解压流打开函数或 None, zip 成员名)"""
+    file_extension, compression = _split_compression(file_path)
+    if compression == 'zip':
+        member = member or _default_zip_member(file_path)
+        file_extension = os.path.splitext(member)[1].lower()
+    if compression is None:
+        return file_extension, None, None
+    return file_extension, _stream_opener(file_path, compression, member), member
+
+def _excel_source(file_path, opener):
+    """Excel 解析需要可随机访问的输入，压缩的 Excel 解压到内存中"""
+    if opener is None:
+        return file_path
+    with opener() as stream:
+        return io.BytesIO(stream.read())
+
+# 常见中文/通用编码回退序列
+_CSV_ENCODINGS = [
+    'utf-8-sig',
+    'gbk', 'cp936',
+    'gb18030',
+    'big5',
+    'latin1',  # 最后兜底：字节到字符一一映射，保证不报错
+]
+
+# 换用编码或解析引擎可能解决的错误；文件读取、解压和归档错误（如缺少 zip 成员、
+# .gz 文件被截断）换编码重试没有意义，直接以原始错误抛出
+_CSV_PARSE_ERRORS = (pd.errors.ParserError, csv.Error)
+
+def _read_csv_with_fallback(file_path: str, opener=None):
     """尝试多种常见编码读取 CSV，避免 'utf-8' 解码失败。
     优先顺序：utf-8-sig -> gbk/cp936 -> gb18030 -> big5 -> latin1
+    opener: 压缩文件的解压流打开函数，每次尝试都重新打开，直接从流中解析
+    只有解码错误和解析错误会触发回退，I/O、解压和归档错误原样抛出
     """
+    def source():
+        return opener() if opener is not None else open(file_path, 'rb')
+
     tried = []
-    # 常见中文/通用编码回退序列
-    encodings = [
-        'utf-8-sig',
-        'gbk', 'cp936',
-        'gb18030',
-        'big5',
-        'latin1',  # 最后兜底：字节到字符一一映射，保证不报错
-    ]
-    for enc in encodings:
+    for enc in _CSV_ENCODINGS:
         try:
-            df = pd.read_csv(file_path, encoding=enc)
+            with source() as stream:
+                df = pd.read_csv(stream, encoding=enc)
             print(f"已使用编码 {enc} 成功读取: {file_path}")
             return df
         except UnicodeDecodeError:
             tried.append(enc)
             continue
-        except Exception:
+        except _CSV_PARSE_ERRORS:
             # 对于分隔符或引擎问题，尝试使用 python 引擎再试一次
             try:
-                df = pd.read_csv(file_path, encoding=enc, engine='python')
+                with source() as stream:
+                    df = pd.read_csv(stream, encoding=enc, engine='python')
                 print(f"已使用编码 {enc} + python 引擎 成功读取: {file_path}")
                 return df
-            except Exception:
+            except (UnicodeDecodeError,) + _CSV_PARSE_ERRORS:
                 tried.append(enc)
                 continue
     raise UnicodeDecodeError("csv", b"", 0, 1, f"所有尝试的编码均失败: {tried}")
 
-def read_file(file_path):
-    """读取 CSV 或 Excel 文件并返回 DataFrame"""
+def read_file(file_path, use_cache=True, member=None):
+    """读取 CSV 或 Excel 文件并返回 DataFrame
+    支持 .gz/.bz2/.xz/.zst 压缩文件（如 data.csv.gz）和 .zip 归档，直接从解压流中解析，不生成临时文件
+    use_cache: 为 True 时优先从解析缓存加载，未命中则解析后写入缓存（见 module.cache）
+    member: zip 归档中要读取的成员名，默认取第一个 CSV/Excel 文件
+    """
     try:
-        _, file_extension = os.path.splitext(file_path)
-        if file_extension.lower() == '.csv':
-            print(f"正在读取 CSV 文件: {file_path}")
-            return _read_csv_with_fallback(file_path)
-        elif file_extension.lower() == '.xlsx':
-            print(f"正在读取 Excel 文件: {file_path}")
-            return pd.read_excel(file_path)
-        else:
+        file_extension, opener, member = _resolve_source(file_path, member)
+        if file_extension not in _SUPPORTED_EXTENSIONS:
             print(f"文件格式不支持: {file_extension}")
             return None
+
+        cache_options = {'reader': 'read_file'}
+        if member:
+            cache_options['member'] = member
+        if use_cache:
+            df = cache.load(file_path, cache_options)
+            if df is not None:
+                print(f"已从缓存加载: {file_path}")
+                return df
+
+        if file_extension == '.csv':
+            print(f"正在读取 CSV 文件: {file_path}")
+            df = _read_csv_with_fallback(file_path, opener)
+        else:
+            print(f"正在读取 Excel 文件: {file_path}")
+            df = pd.read_excel(_excel_source(file_path, opener))
+
+        if use_cache:
+            cache.store(file_path, df, cache_options)
+        return df
     except Exception as e:
         print(f"读取文件 {file_path} 时出错: {e}")
         return None
+
+def read_workbook(file_path, use_cache=True, member=None):
+    """读取工作簿的全部工作表，返回 {工作表名: DataFrame}
+    Excel 文件只解析一次；CSV 文件视为只有一个工作表（以文件名命名）
+    """
+    try:
+        file_extension, opener, member = _resolve_source(file_path, member)
+        if file_extension == '.xlsx':
+            cache_options = {'reader': 'read_workbook'}
+            if member:
+                cache_options['member'] = member
+            if use_cache:
+                sheets = cache.load_sheets(file_path, cache_options)
+                if sheets is not None:
+                    print(f"已从缓存加载工作簿: {file_path}")
+                    return sheets
+            print(f"正在读取 Excel 工作簿: {file_path}")
+            sheets = pd.read_excel(_excel_source(file_path, opener), sheet_name=None)
+            if use_cache:
+                cache.store_sheets(file_path, sheets, cache_options)
+            return sheets
+        df = read_file(file_path, use_cache, member)
+        if df is None:
+            return None
+        sheet_name, extension = os.path.splitext(os.path.basename(member or file_path))
+        if extension.lower() in _COMPRESSION_SUFFIXES:
+            sheet_name = os.path.splitext(sheet_name)[0]
+        sheet_name = sheet_name[:31]
+        return {sheet_name: df}
+    except Exception as e:
+        print(f"读取工作簿 {file_path} 时出错: {e}")
+        return None
     
+def _detect_csv_encoding(file_path, opener=None, sniff_bytes=1 << 20):
+    """只解码文件开头 sniff_bytes 字节（压缩文件为解压后的字节），返回第一个能解码的编码
+    整个文件只在随后的流式解析中读取一遍；开头之后才出现的解码错误由 iter_file_chunks 处理
+    """
+    with (opener() if opener is not None else open(file_path, 'rb')) as f:
+        prefix = f.read(sniff_bytes)
+    for enc in _CSV_ENCODINGS:
+        try:
+            # 未读到文件末尾时，开头截断的多字节字符不算解码错误
+            codecs.getincrementaldecoder(enc)().decode(prefix, final=len(prefix) < sniff_bytes)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return _CSV_ENCODINGS[-1]
+
+def iter_file_chunks(file_path, chunksize, dtype=None, member=None):
+    """分块读取 CSV 或 Excel 文件（含压缩文件和 zip 归档），逐块产出 DataFrame
+    CSV 按行流式读取，内存占用与 chunksize 成正比；编码由文件开头探测，
+    若后文出现解码错误，换用下一个编码重新打开并跳过已经产出的行继续读取；
+    Excel 无法流式解析，先整体读取（可命中解析缓存）再按块切分
+    dtype 只用于 CSV 解析；Excel 单元格本身带有类型，保持原值
+    """
+    file_extension, opener, member = _resolve_source(file_path, member)
+    if file_extension == '.csv':
+        encoding = _detect_csv_encoding(file_path, opener)
+        print(f"正在分块读取 CSV 文件: {file_path}（编码 {encoding}，每块 {chunksize} 行）")
+        encodings = _CSV_ENCODINGS[_CSV_ENCODINGS.index(encoding):]
+        rows_read = 0
+        for position, encoding in enumerate(encodings):
+            # 已产出的都是完整的块，跳过的行数恰好是 chunksize 的整数倍
+            skiprows = range(1, rows_read + 1) if rows_read else None
+            try:
+                with (opener() if opener is not None else open(file_path, 'rb')) as stream:
+                    with pd.read_csv(stream, encoding=encoding, chunksize=chunksize, dtype=dtype,
+                                     skiprows=skiprows) as reader:
+                        for chunk in reader:
+                            rows_read += len(chunk)
+                            yield chunk
+                return
+            except UnicodeDecodeError:
+                if position + 1 == len(encodings):
+                    raise
+                print(f"编码 {encoding} 在第 {rows_read} 行之后解码失败，改用 {encodings[position + 1]} 继续读取")
+    elif file_extension == '.xlsx':
+        df = read_file(file_path, member=member)
+        if df is None:
+            raise ValueError(f"读取文件 {file_path} 失败")
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        raise ValueError(f"文件格式不支持: {file_extension}")
+
+# 整数形式的文本（'1'、'+001'、'1.0'）与其他十进制数字文本（'2.50'、'1e3'）
+_INTEGER_TEXT = re.compile(r'\s*[+-]?\d+(?:\.0*)?\s*')
+_DECIMAL_TEXT = re.compile(r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*')
+
+
+def _number_key(number):
+    """数值键的文本形式：整数值写成整数（1.0 -> '1'），其余用最短的浮点表示"""
+    if number.is_integer():
+        return str(int(number))
+    return repr(number)
+
+
+def _key_text(value):
+    """单个键值的规范文本，空值保持为 NaN"""
+    if isinstance(value, str):
+        if _INTEGER_TEXT.fullmatch(value):
+            return str(int(value.strip().split('.')[0]))
+        if _DECIMAL_TEXT.fullmatch(value):
+            return _number_key(float(value))
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return np.nan if np.isnan(value) else _number_key(float(value))
+    if pd.isna(value):
+        return np.nan
+    return str(value)
+
+
+def normalize_key_values(series):
+    """把比较列规范为两侧一致的文本键，用于分块模式下的哈希分区和合并
+    CSV 的比较列按文本读取，Excel 单元格带有类型，同一个键在两侧可能是 '1'、'1.0'、1 或 1.0，
+    统一规范为 '1'；空值保持为 NaN，不会变成字符串 'nan'
+    """
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        return pd.Series(series.to_numpy().astype(str).astype(object), index=series.index, name=series.name)
+    if pd.api.types.is_float_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        values = series.to_numpy()
+        keys = np.full(len(values), np.nan, dtype=object)
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore'):
+            small = present & (np.abs(values) < 2 ** 62) & (values == np.trunc(values))
+        keys[small] = values[small].astype(np.int64).astype(str)
+        rest = np.flatnonzero(present & ~small)
+        keys[rest] = [_number_key(float(values[i])) for i in rest]
+        return pd.Series(keys, index=series.index, name=series.name)
+    return series.map(_key_text).astype(object)
+
+
+def spill_chunk_by_key(chunk, chunk_number, chunksize, key_column, num_partitions, output_dir, prefix, partitions):
+    """把一个数据块按比较列的哈希值切分，写入各分区的分块文件，并把文件路径追加到 partitions
+    返回: 写入的列名列表（含原始行号列 _original_row_index）
+    """
+    if key_column not in chunk.columns:
+        raise KeyError(f"比较列 '{key_column}' 不存在")
+    chunk = chunk.reset_index(drop=True)
+    # 两侧的键先规范为同一种文本形式，相同的键才能落入同一分区并在合并时匹配
+    chunk[key_column] = normalize_key_values(chunk[key_column])
+    # 记录在原文件中的行号，便于对比结果回溯原始行
+    chunk['_original_row_index'] = range(chunk_number * chunksize, chunk_number * chunksize + len(chunk))
+    buckets = pd.util.hash_pandas_object(chunk[key_column], index=False).to_numpy() % num_partitions
+    for partition, part in chunk.groupby(buckets, sort=False):
+        path = os.path.join(output_dir, f"{prefix}_{partition}_{chunk_number}.pkl")
+        part.to_pickle(path)
+        partitions[partition].append(path)
+    return list(chunk.columns)
+
+def partition_file_by_key(file_path, key_column, num_partitions, output_dir, prefix, chunksize=200000):
+    """按比较列的哈希值把文件分块切分到磁盘上的分区文件
+    两个文件使用相同的 num_partitions 切分后，相同键的行一定落在同编号的分区中，
+    因此可以逐个分区加载、对比，内存占用只取决于单个分区的大小
+    CSV 的比较列按文本读取（避免各块类型推断不一致），再与 Excel 的单元格值一起
+    由 normalize_key_values 规范为同一种文本形式，保证两侧同一个键的哈希值一致
+    返回: (每个分区对应的分区文件路径列表, 列名列表)
+    """
+    partitions = [[] for _ in range(num_partitions)]
+    columns = []
+    for chunk_number, chunk in enumerate(iter_file_chunks(file_path, chunksize, dtype={key_column: str})):
+        try:
+            columns = spill_chunk_by_key(chunk, chunk_number, chunksize, key_column, num_partitions,
+                                         output_dir, prefix, partitions)
+        except KeyError:
+            raise KeyError(f"比较列 '{key_column}' 在文件 {file_path} 中不存在")
+    return partitions, columns
+
+def load_partition(paths, columns=None):
+    """加载一个分区的全部分块文件；分区为空时返回只有表头的 DataFrame"""
+    if not paths:
+        return pd.DataFrame(columns=columns)
+    return pd.concat([pd.read_pickle(path) for path in paths], ignore_index=True)
+
 def save_to_excel(df, output_path):
     """保存 DataFrame 到 Excel 文件"""
     try:
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线模块
+把读取、对比、写出等步骤拆成在独立线程中运行的阶段，阶段之间用有界队列连接：
+下游处理不过来时上游在 put 上阻塞（背压），内存占用不随数据量增长；
+每个阶段分别统计处理耗时、等待输入和等待输出的时间，便于找出瓶颈阶段
+"""
+import queue
+import threading
+import time
+
+import pandas as pd
+
+# 阶段结束标记
+_END = object()
+
+
+class StageStats:
+    """单个阶段的统计信息"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.busy = 0.0
+        self.wait_input = 0.0
+        self.wait_output = 0.0
+        self.started = None
+        self.finished = None
+
+    def as_dict(self):
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'rows': self.rows,
+            'busy_seconds': round(self.busy, 4),
+            'wait_input_seconds': round(self.wait_input, 4),
+            'wait_output_seconds': round(self.wait_output, 4),
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(self.rows / self.busy, 1) if self.busy else None,
+        }
+
+
+def _item_rows(item):
+    """数据块的行数：DataFrame 取行数，元组取其中各 DataFrame 行数之和"""
+    if isinstance(item, pd.DataFrame):
+        return len(item)
+    if isinstance(item, tuple):
+        return sum(len(part) for part in item if isinstance(part, pd.DataFrame))
+    return 0
+
+
+def _put(out_queue, item, stop, stats):
+    """放入输出队列，队列满时阻塞并计入等待输出时间；流水线中止时返回 False"""
+    started = time.perf_counter()
+    try:
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    finally:
+        stats.wait_output += time.perf_counter() - started
+
+
+def _get(in_queue, stop, stats):
+    """从输入队列取数据，队列空时阻塞并计入等待输入时间；流水线中止时返回结束标记"""
+    started = time.perf_counter()
+    try:
+        while not stop.is_set():
+            try:
+                return in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+    finally:
+        stats.wait_input += time.perf_counter() - started
+
+
+def _run_source(produce, out_queue, stats, stop, errors):
+    """源阶段：逐个产出数据块"""
+    stats.started = time.perf_counter()
+    try:
+        iterator = iter(produce())
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                stats.busy += time.perf_counter() - started
+            stats.items += 1
+            stats.rows += _item_rows(item)
+            if not _put(out_queue, item, stop, stats):
+                break
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(out_queue, _END, stop, stats)
+        stats.finished = time.perf_counter()
+
+
+def _run_stage(process, in_queue, out_queue, stats, stop, errors):
+    """中间阶段或末端阶段：处理每个数据块，末端阶段没有输出队列"""
+    stats.started = time.perf_counter()
+    try:
+        while True:
+            item = _get(in_queue, stop, stats)
+            if item is _END:
+                break
+            started = time.perf_counter()
+            result = process(item)
+            stats.busy += time.perf_counter() - started
+            stats.items += 1
+            stats.rows += _item_rows(item)
+            if out_queue is not None and result is not None:
+                if not _put(out_queue, result, stop, stats):
+                    break
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        if out_queue is not None:
+            _put(out_queue, _END, stop, stats)
+        stats.finished = time.perf_counter()
+
+
+def run_pipeline(source, stages, queue_size=2):
+    """运行流水线，返回各阶段的统计信息
+    参数:
+      source: (阶段名, 无参函数)，函数返回产出数据块的可迭代对象
+      stages: [(阶段名, 处理函数), ...]，最后一个为末端阶段，其返回值被忽略
+      queue_size: 阶段间队列容量，决定最多有多少个数据块同时驻留在内存中
+    任一阶段出错时中止整条流水线，并在所有线程结束后抛出该错误
+    """
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stats = [StageStats(source[0])] + [StageStats(name) for name, _ in stages]
+
+    threads = [threading.Thread(target=_run_source, args=(source[1], queues[0], stats[0], stop, errors), daemon=True)]
+    for i, (_, process) in enumerate(stages):
+        out_queue = queues[i + 1] if i + 1 < len(stages) else None
+        threads.append(threading.Thread(
+            target=_run_stage, args=(process, queues[i], out_queue, stats[i + 1], stop, errors), daemon=True))
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return [stage.as_dict() for stage in stats]
+
+
+def print_stage_report(title, stage_stats, wall_seconds=None):
+    """打印各阶段的吞吐和阻塞时间，并标出处理耗时最长的瓶颈阶段"""
+    print(f"\n{title}")
+    print(f"{'阶段':<12}{'数据块':>8}{'行数':>12}{'处理(秒)':>10}{'等待输入(秒)':>14}{'等待输出(秒)':>14}{'行/秒':>12}")
+    for stage in stage_stats:
+        print(f"{stage['stage']:<12}{stage['items']:>8}{stage['rows']:>12}{stage['busy_seconds']:>10.2f}"
+              f"{stage['wait_input_seconds']:>14.2f}{stage['wait_output_seconds']:>14.2f}"
+              f"{stage['rows_per_second'] or 0:>12.0f}")
+    bottleneck = max(stage_stats, key=lambda stage: stage['busy_seconds'])
+    print(f"瓶颈阶段: {bottleneck['stage']}（处理 {bottleneck['busy_seconds']:.2f} 秒）")
+    if wall_seconds is not None:
+        print(f"总耗时: {wall_seconds:.2f} 秒")
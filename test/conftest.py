@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试公共配置"""
+import pytest
+
+from module import cache
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(tmp_path, monkeypatch):
+    """读取文件时的解析缓存写到每个测试的临时目录，不落到用户的缓存目录"""
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path / 'cache'))
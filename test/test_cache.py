@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析结果缓存的测试：首次解析与命中缓存的结果必须完全一致"""
+import os
+
+import pandas as pd
+import pytest
+
+from module import cache
+from module.files import read_file, read_workbook
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'cache'
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(directory))
+    monkeypatch.setattr(cache, 'CACHE_ENABLED', True)
+    return directory
+
+
+def _sample():
+    return pd.DataFrame({
+        'A': [1, 2, 3],
+        2024: [1.5, None, 3.0],
+        '混合': [1, 'a', 2.5],
+        '日期': pd.to_datetime(['2024-01-01', '2024-02-01', None]),
+    })
+
+
+def _assert_cache_hit_equal(read, path, cache_dir, capsys):
+    first = read(path)
+    assert any(name.endswith('.arrow') for name in os.listdir(cache_dir))
+    second = read(path)
+    assert '写入缓存失败' not in capsys.readouterr().out
+    return first, second
+
+
+def test_xlsx_cache_hit_equals_first_read(tmp_path, cache_dir, capsys):
+    path = str(tmp_path / 'sample.xlsx')
+    _sample().to_excel(path, index=False)
+    first, second = _assert_cache_hit_equal(read_file, path, cache_dir, capsys)
+    assert 2024 in second.columns
+    assert second['混合'].tolist() == [1, 'a', 2.5]
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_csv_cache_hit_equals_first_read(tmp_path, cache_dir, capsys):
+    path = str(tmp_path / 'sample.csv')
+    _sample().to_csv(path, index=False)
+    first, second = _assert_cache_hit_equal(read_file, path, cache_dir, capsys)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_workbook_cache_hit_equals_first_read(tmp_path, cache_dir, capsys):
+    path = str(tmp_path / 'book.xlsx')
+    with pd.ExcelWriter(path) as writer:
+        _sample().to_excel(writer, sheet_name='一', index=False)
+        _sample().iloc[:1].to_excel(writer, sheet_name='二', index=False)
+    first, second = _assert_cache_hit_equal(read_workbook, path, cache_dir, capsys)
+    assert list(first) == list(second)
+    for name in first:
+        pd.testing.assert_frame_equal(first[name], second[name])
+
+
+def test_ints_beyond_int64_are_cached(tmp_path, cache_dir, capsys):
+    path = str(tmp_path / 'big.csv')
+    df = pd.DataFrame({'A': [1, 2], '大数': [2 ** 70, 1]})
+    df.to_csv(path, index=False)
+    cache.store(path, df)
+    assert '写入缓存失败' not in capsys.readouterr().out
+    pd.testing.assert_frame_equal(cache.load(path), df)
+
+
+def test_evict_removes_least_recently_used_first(tmp_path, cache_dir):
+    sources = []
+    for index in range(3):
+        path = str(tmp_path / f"{index}.csv")
+        pd.DataFrame({'A': range(100)}).to_csv(path, index=False)
+        cache.store(path, pd.DataFrame({'A': range(100)}))
+        sources.append(path)
+    files = {path: os.path.join(cache_dir, cache._cache_key(path, None) + '.arrow') for path in sources}
+    # 访问时间依次为 2、0、1：第二个文件最久未使用
+    for age, path in zip((2, 0, 1), sources):
+        os.utime(files[path], (1_000_000 + age, 1_000_000 + age))
+    size = os.path.getsize(files[sources[0]])
+
+    cache.evict(max_bytes=2 * size)
+    assert [os.path.exists(files[path]) for path in sources] == [True, False, True]
+    cache.evict(max_bytes=size)
+    assert [os.path.exists(files[path]) for path in sources] == [True, False, False]
+    # 命中缓存会刷新访问时间
+    assert cache.load(sources[0]) is not None
+    assert os.path.getmtime(files[sources[0]]) > 1_000_002
+
+
+def test_disabled_cache_neither_reads_nor_writes(tmp_path, cache_dir, monkeypatch):
+    path = str(tmp_path / 'sample.csv')
+    _sample().to_csv(path, index=False)
+
+    cache.set_enabled(False)
+    read_file(path)
+    assert not cache.is_enabled()
+    assert not cache_dir.exists() or not os.listdir(cache_dir)
+
+    cache.set_enabled(True)
+    read_file(path, use_cache=False)
+    assert not cache_dir.exists() or not os.listdir(cache_dir)
+    read_file(path)
+    assert os.listdir(cache_dir)
+
+    # 已有缓存时 use_cache=False 也不读取缓存
+    loads = []
+    monkeypatch.setattr(cache, 'load', lambda *args, **kwargs: loads.append(args))
+    read_file(path, use_cache=False)
+    assert loads == []
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按列比较规则的测试"""
+import numpy as np
+import pandas as pd
+
+from TableComparison import _column_difference, _resolve_rule
+
+
+def _diff(values1, values2, **rule):
+	return _column_difference(pd.Series(values1), pd.Series(values2), _resolve_rule({'*': rule}, 'A')).tolist()
+
+
+def test_numeric_tolerance_kept_with_parse_dates():
+	values1 = [100.0, 5, 1000]
+	values2 = [100.9, 5.5, 1000.7]
+	assert _diff(values1, values2, atol=0.5) == [True, False, True]
+	assert _diff(values1, values2, atol=0.5, parse_dates=True) == [True, False, True]
+	assert _diff(values1, values2, atol=1, parse_dates=True) == [False, False, False]
+
+
+def test_numeric_cells_in_object_column_not_parsed_as_dates():
+	values1 = pd.Series([100.0, '2024-01-02'], dtype=object)
+	values2 = pd.Series([100.9, '2024/01/02'], dtype=object)
+	rule = _resolve_rule({'*': {'parse_dates': True}}, 'A')
+	assert _column_difference(values1, values2, rule).tolist() == [True, False]
+
+
+def test_parse_dates_matches_different_formats():
+	assert _diff(['2024-01-02', '2024-03-01'], ['2024/01/02', '2024/03/02'], parse_dates=True) == [False, True]
+	assert _diff(['2024-01-02'], ['2024/01/02']) == [True]
+
+
+def test_nulls_and_empty_strings():
+	assert _diff([np.nan, '', 'a'], ['', np.nan, None]) == [False, False, True]
+
+
+def test_large_integers_compare_exactly():
+	assert _diff([1_000_000_000], [1_000_000_001]) == [True]
+	assert _diff([2 ** 53 + 1], [float(2 ** 53)]) == [True]
+	assert _diff([2 ** 53], [float(2 ** 53)]) == [False]
+	big = pd.Series([2 ** 63 - 1], dtype='int64')
+	assert _column_difference(big, pd.Series([2 ** 63 - 2], dtype='uint64'), _resolve_rule(None, 'A')).tolist() == [True]
+	assert _diff(pd.Series([123456789012345678901], dtype=object), ['123456789012345678902']) == [True]
+
+
+def test_long_digit_strings_are_not_coerced_to_float():
+	assert _diff(['110101199003071234'], ['110101199003071299']) == [True]
+	assert _diff(['110101199003071234'], ['110101199003071234 ']) == [False]
+
+
+def test_leading_zeros_kept_unless_numeric_text():
+	assert _diff(['007'], ['7']) == [True]
+	assert _diff(['007'], ['7'], numeric_text=True) == [False]
+	# 另一侧是数值时按数值比较
+	assert _diff(pd.Series(['7', '1.0'], dtype=object), [7, 1]) == [False, False]
+
+
+def test_relative_tolerance_is_opt_in():
+	assert _diff([0.1 + 0.2], [0.3]) == [True]
+	assert _diff([0.1 + 0.2], [0.3], rtol=1e-9) == [False]
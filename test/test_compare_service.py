@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""对比服务的测试：访问控制、基准表键索引和工作内存预算"""
+import http.client
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import compare_service
+from TableComparison import KeyIndex, merge_and_reorder, merge_and_reorder_indexed
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(compare_service, 'TOKEN_DIR', str(tmp_path))
+    server = compare_service.create_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1], compare_service._read_token(server.token_file)
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read().decode('utf-8'))
+
+
+def test_requests_without_token_or_json_are_rejected(service):
+    port, token = service
+    body = json.dumps({'name': 'a', 'path': '/etc/passwd', 'comparison_column': 'x'})
+    assert _request(port, 'POST', '/baselines', body, {'Content-Type': 'text/plain'})[0] == 401
+    assert _request(port, 'POST', '/baselines', body, {
+        'Content-Type': 'text/plain', compare_service.TOKEN_HEADER: token})[0] == 415
+    assert _request(port, 'GET', '/baselines', headers={
+        'Host': f'attacker.example:{port}', compare_service.TOKEN_HEADER: token})[0] == 403
+    assert _request(port, 'GET', '/health', headers={compare_service.TOKEN_HEADER: token}) == (200, {'status': 'ok'})
+
+
+def test_client_reads_token_file(service):
+    port, _ = service
+    assert compare_service.ComparisonClient(port=port).health() == {'status': 'ok'}
+
+
+def test_non_loopback_host_requires_opt_in():
+    with pytest.raises(ValueError):
+        compare_service.serve('0.0.0.0', 0)
+
+
+def test_job_uses_prepared_baseline_and_counts_keys(tmp_path):
+    from TableComparison import compute_difference_masks, summarize_differences
+
+    base = pd.DataFrame({'K': [1, 2, 3, 3], 'v': ['a', 'b', 'c', 'd']})
+    new = pd.DataFrame({'K': [2, 3, 4], 'v': ['b', 'x', 'y']})
+    base.to_csv(tmp_path / 'base.csv', index=False)
+    new.to_csv(tmp_path / 'new.csv', index=False)
+
+    service = compare_service.ComparisonService(memory_budget_bytes=1 << 30)
+    service.baselines.load('b', str(tmp_path / 'base.csv'), 'K')
+    job = service.run_job({'baseline': 'b', 'file': str(tmp_path / 'new.csv')})
+    merged_df, column_pairs = merge_and_reorder(base, new, 'K')
+    expected = summarize_differences(compute_difference_masks(merged_df, column_pairs))
+    assert 'error' not in job
+    assert job['rows'] == len(merged_df)
+    assert job['differences'] == {f"{col1} / {col2}": count for (col1, col2), count in expected.items()}
+    assert (job['added_keys'], job['removed_keys']) == (1, 1)
+    assert service.baselines.describe()['memory_reserved_by_jobs_mb'] == 0
+
+
+def test_job_working_memory_evicts_other_baselines(tmp_path):
+    pd.DataFrame({'K': range(1000), 'v': 'x' * 20}).to_csv(tmp_path / 'a.csv', index=False)
+    store = compare_service.BaselineStore(memory_budget_bytes=1 << 30)
+    first = store.load('first', str(tmp_path / 'a.csv'), 'K')
+    second = store.load('second', str(tmp_path / 'a.csv'), 'K')
+    store.memory_budget_bytes = first.nbytes + second.nbytes
+    store.reserve(first.nbytes, keep='second')
+    assert [b['name'] for b in store.describe()['baselines']] == ['second']
+    store.release(first.nbytes)
+
+
+@pytest.mark.parametrize('preserve_order_by', [None, 'df1', 'df2'])
+def test_indexed_merge_matches_merge_without_merging_baseline(preserve_order_by, monkeypatch):
+    base = pd.DataFrame({'K': [3.0, 1.0, np.nan, 3.0, 2.0], 'v': list('abcde'), 'only1': 1})
+    new = pd.DataFrame({'K': [3.0, 5.0, np.nan, 3.0, 1.0], 'v': list('axcyz'), 'only2': 2})
+    key_index = KeyIndex(base['K'])
+    expected = merge_and_reorder(base, new, 'K', preserve_order_by)
+
+    def no_merge(*args, **kwargs):
+        raise AssertionError('基准表不应再做 pd.merge')
+
+    monkeypatch.setattr(pd, 'merge', no_merge)
+    merged_df, column_pairs = merge_and_reorder_indexed(base, key_index, new, 'K', preserve_order_by)
+    pd.testing.assert_frame_equal(merged_df, expected[0])
+    assert column_pairs == expected[1]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""文件读取与分块切分的测试"""
+import gzip
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from module.files import _read_csv_with_fallback, _resolve_source, iter_file_chunks, normalize_key_values, read_file
+
+
+def test_key_normalization_matches_across_sources():
+    csv_keys = normalize_key_values(pd.Series(['1', '1.0', '+002', '2.50', 'A1', None], dtype=object))
+    excel_keys = normalize_key_values(pd.Series([1.0, 1.0, 2.0, 2.5, 'A1', np.nan], dtype=object))
+    float_keys = normalize_key_values(pd.Series([1.0, 1.0, 2.0, 2.5, np.nan, np.nan]))
+    assert csv_keys.tolist()[:5] == ['1', '1', '2', '2.5', 'A1']
+    assert excel_keys.tolist()[:5] == csv_keys.tolist()[:5]
+    assert float_keys.tolist()[:4] == csv_keys.tolist()[:4]
+    assert csv_keys.isna().tolist() == excel_keys.isna().tolist() == [False] * 5 + [True]
+    assert float_keys.isna().tolist() == [False] * 4 + [True, True]
+
+
+def test_large_integer_keys_stay_exact():
+    keys = normalize_key_values(pd.Series(['12345678901234567891', '12345678901234567892']))
+    assert keys.tolist() == ['12345678901234567891', '12345678901234567892']
+    assert normalize_key_values(pd.Series([2 ** 62 + 1])).tolist() == [str(2 ** 62 + 1)]
+
+
+def test_chunked_csv_falls_back_when_late_rows_fail_to_decode(tmp_path):
+    path = tmp_path / 'late.csv'
+    lines = ['id,name'] + [f'{i},name{i}' for i in range(120000)] + ['120000,中文名称']
+    path.write_bytes(('\n'.join(lines) + '\n').encode('gbk'))
+    # 文件开头 1 MB 只有 ASCII，探测为 utf-8-sig；末尾的 GBK 字节在流式读取中才会解码失败
+    df = pd.concat(iter_file_chunks(str(path), 40000), ignore_index=True)
+    assert df['id'].tolist() == list(range(120001))
+    assert df['name'].iloc[-1] == '中文名称'
+
+
+def test_stream_errors_are_not_reported_as_encoding_failures(tmp_path, capsys):
+    data = ('\n'.join(['id,name'] + [f'{i},name{i}' for i in range(20000)]) + '\n').encode('utf-8')
+    truncated = tmp_path / 'data.csv.gz'
+    truncated.write_bytes(gzip.compress(data)[:-200])
+    with pytest.raises(EOFError):
+        _read_csv_with_fallback(str(truncated), _resolve_source(str(truncated))[1])
+
+    archive = tmp_path / 'data.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('data.csv', data)
+    assert read_file(str(archive), use_cache=False, member='missing.csv') is None
+    output = capsys.readouterr().out
+    assert 'missing.csv' in output
+    assert '所有尝试的编码均失败' not in output
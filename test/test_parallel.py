@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""多核分区合并引擎的测试：结果必须与串行路径一致"""
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from TableComparison import _parallel_context, compute_difference_masks, merge_and_reorder, merge_and_reorder_parallel
+
+
+def _frames():
+	rng = np.random.default_rng(0)
+	n = 2000
+	df1 = pd.DataFrame({
+		'K': rng.permutation(n), 'x': rng.integers(0, 3, n), 's': np.array(['a', 'b'])[rng.integers(0, 2, n)],
+		'b': rng.random(n) > 0.5, 2024: rng.integers(0, 2, n), 'only1': 1,
+	})
+	df2 = df1.sample(frac=1, random_state=1).rename(columns={'only1': 'only2'})
+	df2['K'] = (df2['K'] + 200).astype(float)
+	df2['x'] = rng.integers(0, 3, n)
+	# 重复键
+	return pd.concat([df1, df1.iloc[:20]], ignore_index=True), df2
+
+
+def _assert_parallel_matches_serial(df1, df2, preserve_order_by=None, column_sort_strategy='alternating'):
+	merged_df, column_pairs = merge_and_reorder(df1, df2, 'K', preserve_order_by, column_sort_strategy)
+	diff_masks = compute_difference_masks(merged_df, column_pairs)
+	parallel_df, parallel_pairs, parallel_masks = merge_and_reorder_parallel(
+		df1, df2, 'K', preserve_order_by, column_sort_strategy, workers=3, min_rows=0)
+	pd.testing.assert_frame_equal(merged_df, parallel_df)
+	assert parallel_pairs == column_pairs
+	for pair in column_pairs:
+		assert (parallel_masks[pair] == diff_masks[pair]).all()
+
+
+@pytest.mark.parametrize('preserve_order_by', [None, 'df1', 'df2'])
+@pytest.mark.parametrize('column_sort_strategy', ['alternating', 'grouped'])
+def test_parallel_matches_serial(preserve_order_by, column_sort_strategy):
+	_assert_parallel_matches_serial(*_frames(), preserve_order_by, column_sort_strategy)
+
+
+def test_threaded_caller_does_not_fork():
+	"""在其他线程中调用（如 GUI 的对比线程）时改用 forkserver/spawn，输入经 Arrow 文件内存映射，结果不变"""
+	df1, df2 = _frames()
+	# 混合类型列无法写成 Arrow，退回为逐个分区序列化传送
+	mixed1, mixed2 = df1.assign(m=[1, 'a'] * (len(df1) // 2)), df2.assign(m=['a', 1] * (len(df2) // 2))
+	methods = []
+	errors = []
+
+	def run():
+		try:
+			methods.append(_parallel_context().get_start_method())
+			_assert_parallel_matches_serial(df1, df2, 'df2')
+			_assert_parallel_matches_serial(mixed1, mixed2)
+		except Exception as e:
+			errors.append(e)
+
+	thread = threading.Thread(target=run)
+	thread.start()
+	thread.join()
+	assert not errors, errors
+	assert methods and methods[0] != 'fork'
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""流水线模块的测试：背压、出错中止和阶段统计"""
+import itertools
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from module.pipeline import run_pipeline
+
+
+def _run_with_timeout(target, timeout=10):
+	"""在线程中运行，超时视为流水线卡死"""
+	result = {}
+
+	def run():
+		try:
+			result['value'] = target()
+		except Exception as e:
+			result['error'] = e
+
+	thread = threading.Thread(target=run, daemon=True)
+	thread.start()
+	thread.join(timeout)
+	assert not thread.is_alive(), '流水线没有在限定时间内结束'
+	return result
+
+
+def test_bounded_queue_applies_backpressure():
+	queue_size = 2
+	produced = []
+	consumed = []
+	in_flight = []
+
+	def source():
+		for i in range(20):
+			produced.append(i)
+			in_flight.append(len(produced) - len(consumed))
+			yield pd.DataFrame({'a': range(10)})
+
+	def slow_sink(item):
+		consumed.append(item)
+		time.sleep(0.01)
+
+	stats = run_pipeline(('源', source), [('慢速末端', slow_sink)], queue_size)
+	# 同时驻留的数据块不超过：队列中的 queue_size 个，源阶段刚产出、等待放入队列的 1 个，
+	# 以及末端阶段刚取出、尚未记录的 1 个；没有背压时 20 个会几乎同时产出
+	assert max(in_flight) <= queue_size + 2
+	assert len(consumed) == 20
+	source_stats, sink_stats = stats
+	assert source_stats['wait_output_seconds'] > 0.1
+	assert sink_stats['busy_seconds'] >= 0.2
+
+
+@pytest.mark.parametrize('failing_stage', ['源', '中间', '末端'])
+def test_stage_error_stops_pipeline_without_hanging(failing_stage):
+	def source():
+		for i in itertools.count():
+			if failing_stage == '源' and i == 3:
+				raise ValueError(failing_stage)
+			yield i
+
+	def middle(item):
+		if failing_stage == '中间' and item == 3:
+			raise ValueError(failing_stage)
+		return item
+
+	def sink(item):
+		if failing_stage == '末端' and item == 3:
+			raise ValueError(failing_stage)
+
+	# 源阶段无限产出，只有出错中止才能让流水线结束
+	result = _run_with_timeout(lambda: run_pipeline(('源', source), [('中间', middle), ('末端', sink)], queue_size=1))
+	assert isinstance(result.get('error'), ValueError)
+	assert str(result['error']) == failing_stage
+
+
+def test_stage_stats_fields():
+	def source():
+		for size in (3, 4, 5):
+			yield pd.DataFrame({'a': range(size)})
+
+	def split(frame):
+		return frame.iloc[:1], frame.iloc[1:]
+
+	stats = run_pipeline(('读取', source), [('拆分', split), ('写出', lambda item: None)])
+	assert [stage['stage'] for stage in stats] == ['读取', '拆分', '写出']
+	for stage in stats:
+		assert set(stage) == {
+			'stage', 'items', 'rows', 'busy_seconds', 'wait_input_seconds', 'wait_output_seconds',
+			'elapsed_seconds', 'rows_per_second',
+		}
+		assert stage['items'] == 3
+		# 元组数据块的行数为其中各 DataFrame 行数之和
+		assert stage['rows'] == 12
+		assert stage['elapsed_seconds'] >= stage['busy_seconds'] >= 0
+		assert stage['rows_per_second'] is None or stage['rows_per_second'] > 0
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""差异汇总报告的测试"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from TableComparison import (
+	DifferenceSummary, _key_changes, _matched_rows, _summarize_merged, data_comparison, merge_and_reorder,
+	summary_comparison_chunked,
+)
+
+
+def _summarize(df1, df2, preserve_order_by=None, column_rules=None):
+	merged_df, column_pairs = merge_and_reorder(df1, df2, 'A', preserve_order_by)
+	summary = DifferenceSummary('A', column_rules=column_rules)
+	summary.update_keys(*_key_changes(df1, df2, 'A'))
+	_summarize_merged(summary, merged_df, column_pairs, column_rules,
+		matched=_matched_rows(merged_df, 'A', df1, df2))
+	return summary.to_dict()
+
+
+def test_added_and_removed_rows_are_not_column_mismatches():
+	df1 = pd.DataFrame({'A': [1, 2, 3], 'B': ['x', 'y', 'z']})
+	df2 = pd.DataFrame({'A': [2, 3, 4], 'B': ['y', 'changed', 'w']})
+	for preserve_order_by in (None, 'df1', 'df2'):
+		report = _summarize(df1, df2, preserve_order_by)
+		assert report['added_keys']['count'] == 1
+		assert report['removed_keys']['count'] == 1
+		assert report['rows_with_differences'] == 1
+		assert report['columns'][0]['mismatches'] == 1
+		assert report['columns'][0]['sample_keys'] == [3]
+
+
+def test_null_split_uses_column_rule():
+	df1 = pd.DataFrame({'A': [1, 2], 'B': ['', np.nan]})
+	df2 = pd.DataFrame({'A': [1, 2], 'B': ['x', 'x']})
+	column = _summarize(df1, df2)['columns'][0]
+	assert (column['null_vs_value'], column['value_changed']) == (2, 0)
+	column = _summarize(df1, df2, column_rules={'B': {'empty_as_null': False}})['columns'][0]
+	assert (column['null_vs_value'], column['value_changed']) == (1, 1)
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_chunked_csv_output_writes_summary(tmp_path, workers):
+	rng = np.random.default_rng(0)
+	df1 = pd.DataFrame({'A': range(300), 'B': rng.integers(0, 3, 300), 'C': 'x'})
+	df2 = pd.DataFrame({'A': range(20, 320), 'B': rng.integers(0, 3, 300), 'C': 'x'})
+	file1, file2 = str(tmp_path / '1.csv'), str(tmp_path / '2.csv')
+	df1.to_csv(file1, index=False)
+	df2.to_csv(file2, index=False)
+
+	output_path = str(tmp_path / 'out.csv')
+	data_comparison('A', file1, file2, 'df1', 'alternating', output_path,
+		summary_path=str(tmp_path / 'summary'), chunksize=100, workers=workers)
+	with open(tmp_path / 'summary.json', encoding='utf-8') as f:
+		report = json.load(f)
+	expected = summary_comparison_chunked('A', file1, file2, chunksize=100, num_partitions=4).to_dict()
+	assert report['added_keys']['count'] == expected['added_keys']['count'] == 20
+	assert report['removed_keys']['count'] == expected['removed_keys']['count'] == 20
+	assert report['rows_with_differences'] == expected['rows_with_differences'] > 0
+	assert [c['mismatches'] for c in report['columns']] == [c['mismatches'] for c in expected['columns']]
+	assert len(pd.read_csv(output_path)) == len(df1)
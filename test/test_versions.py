@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""多版本（N 路）对比的测试"""
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from TableComparison import data_comparison_versions, merge_versions
+
+
+def _versions():
+	return [
+		pd.DataFrame({'A': [1, 2, 3], 'B': ['x', 'y', 'z'], 'C': [10, 20, 30]}),
+		pd.DataFrame({'A': [3, 1, 2], 'B': ['z', 'x', 'y2'], 'C': [30, 11, 20]}),
+		pd.DataFrame({'A': [1, 2, 4], 'B': ['x', 'y3', 'w']}),
+	]
+
+
+def _masks(diff_masks):
+	return {pair: mask.tolist() for pair, mask in diff_masks.items()}
+
+
+def test_previous_version_mode():
+	merged_df, column_pairs, diff_masks = merge_versions(_versions(), 'A')
+	assert merged_df['A'].tolist() == [1, 2, 3, 4]
+	assert column_pairs == [('B_v1', 'B_v2'), ('B_v2', 'B_v3'), ('C_v1', 'C_v2'), ('C_v2', 'C_v3')]
+	masks = _masks(diff_masks)
+	# 键 4 只出现在第三个版本，前两个版本都为空值，不算变化
+	assert masks[('B_v1', 'B_v2')] == [False, True, False, False]
+	assert masks[('B_v2', 'B_v3')] == [False, True, True, True]
+	assert masks[('C_v1', 'C_v2')] == [True, False, False, False]
+	assert merged_df['_v2_original_index'].iloc[:3].tolist() == [1, 2, 0]
+	assert np.isnan(merged_df['_v2_original_index'].iloc[3])
+
+
+def test_baseline_mode_and_validation():
+	_, column_pairs, diff_masks = merge_versions(_versions(), 'A', labels=['r1', 'r2', 'r3'], baseline='r1')
+	assert column_pairs == [('B_r1', 'B_r2'), ('B_r1', 'B_r3'), ('C_r1', 'C_r2'), ('C_r1', 'C_r3')]
+	assert _masks(diff_masks)[('B_r1', 'B_r3')] == [False, True, True, True]
+	assert merge_versions(_versions(), 'A', baseline=2)[1][0] == ('B_v3', 'B_v1')
+	for baseline in (-1, 3, 'v9'):
+		with pytest.raises(ValueError):
+			merge_versions(_versions(), 'A', baseline=baseline)
+
+
+def test_version_missing_a_column():
+	merged_df, _, diff_masks = merge_versions(_versions(), 'A')
+	# 第三个版本没有 C 列：该版本下为空值，已有的值都标记为变化
+	assert merged_df['C_v3'].isna().all()
+	assert _masks(diff_masks)[('C_v2', 'C_v3')] == [True, True, True, False]
+
+
+def test_duplicate_and_nan_keys_are_kept():
+	dfs = [
+		pd.DataFrame({'A': [1, 2, 2, np.nan], 'B': ['a', 'b', 'c', 'n']}),
+		pd.DataFrame({'A': [np.nan, 2, 1, 2], 'B': ['n', 'b', 'a', 'C']}),
+	]
+	merged_df, _, diff_masks = merge_versions(dfs, 'A')
+	assert len(merged_df) == 4
+	assert merged_df['B_v1'].tolist() == ['a', 'b', 'c', 'n']
+	assert merged_df['B_v2'].tolist() == ['a', 'b', 'C', 'n']
+	assert merged_df['A'].isna().tolist() == [False, False, False, True]
+	assert _masks(diff_masks)[('B_v1', 'B_v2')] == [False, False, True, False]
+
+
+def test_data_comparison_versions_highlights_changed_side(tmp_path):
+	files = []
+	for index, df in enumerate(_versions()):
+		path = str(tmp_path / f"r{index + 1}.csv")
+		df.to_csv(path, index=False)
+		files.append(path)
+	output_path = str(tmp_path / 'out.xlsx')
+	data_comparison_versions('A', files, output_path)
+
+	sheet = load_workbook(output_path).active
+	header = {cell.value: cell.column_letter for cell in sheet[1]}
+	highlighted = {cell.coordinate for row in sheet.iter_rows() for cell in row if cell.fill.fill_type == 'solid'}
+	# 只高亮每对中的当前版本一侧
+	assert f"{header['B_v2']}3" in highlighted
+	assert f"{header['B_v1']}3" not in highlighted
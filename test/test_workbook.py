@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""多工作表工作簿对比的测试"""
+import pandas as pd
+from openpyxl import load_workbook
+
+import module.files
+from TableComparison import workbook_comparison
+
+
+def _write_workbook(path, sheets):
+	with pd.ExcelWriter(path, engine='openpyxl') as writer:
+		for name, df in sheets.items():
+			df.to_excel(writer, sheet_name=name, index=False)
+
+
+def _highlighted(sheet):
+	return {
+		cell.coordinate
+		for row in sheet.iter_rows()
+		for cell in row
+		if cell.fill.fill_type == 'solid'
+	}
+
+
+def test_sheets_matched_by_name_and_highlighted(tmp_path, monkeypatch):
+	file1 = tmp_path / '1.xlsx'
+	file2 = tmp_path / '2.xlsx'
+	_write_workbook(file1, {
+		'订单': pd.DataFrame({'A': [1, 2, 3], 'B': ['x', 'y', 'z']}),
+		'汇总': pd.DataFrame({'A': [1, 2], 'C': [10, 20]}),
+		'旧表': pd.DataFrame({'A': [1]}),
+	})
+	# 工作表顺序与文件1不同，按名称而不是位置匹配
+	_write_workbook(file2, {
+		'汇总': pd.DataFrame({'A': [1, 2], 'C': [10, 21]}),
+		'新表': pd.DataFrame({'A': [1]}),
+		'订单': pd.DataFrame({'A': [1, 2, 3], 'B': ['x', 'changed', 'z']}),
+	})
+
+	reads = []
+	read_workbook = module.files.read_workbook
+
+	def counting_read_workbook(file_path, *args, **kwargs):
+		reads.append(str(file_path))
+		return read_workbook(file_path, use_cache=False)
+
+	monkeypatch.setattr(module.files, 'read_workbook', counting_read_workbook)
+	output_path = tmp_path / 'out.xlsx'
+	workbook_comparison('A', str(file1), str(file2), None, 'alternating', str(output_path), max_workers=1)
+
+	assert sorted(reads) == sorted([str(file1), str(file2)])
+
+	workbook = load_workbook(output_path)
+	# 与工作表重名的汇总表被改名，原 '汇总' 工作表保留为对比结果
+	assert set(workbook.sheetnames) == {'_汇总', '汇总', '订单'}
+	summary = pd.read_excel(output_path, sheet_name='_汇总').set_index('工作表')
+	assert summary.loc['旧表', '状态'] == '仅存在于文件1'
+	assert summary.loc['新表', '状态'] == '仅存在于文件2'
+	assert summary.loc['订单', '状态'] == '已对比'
+	assert summary.loc['订单', '存在差异的行数'] == 1
+	assert summary.loc['汇总', '存在差异的行数'] == 1
+
+	# 第3行为第二个键（A=2）所在行；成对的两列都被高亮，其他单元格不变
+	orders = workbook['订单']
+	header = {cell.value: cell.column_letter for cell in orders[1]}
+	assert _highlighted(orders) == {f"{header['B']}3", f"{header['B_2']}3"}
+	totals = workbook['汇总']
+	header = {cell.value: cell.column_letter for cell in totals[1]}
+	assert _highlighted(totals) == {f"{header['C']}3", f"{header['C_2']}3"}